@@ -9,6 +9,10 @@ This evaluation script:
 3. Executes the tests using local run scripts and collects results
 4. Calculates overall accuracy based on test pass/fail status
 
+The same logic is importable: ``load_samples`` reads the task rows and
+``evaluate_patches`` is an async generator that evaluates patches (from a list
+or an async iterable) and yields ``(patch_sample, passed)`` as each finishes.
+
 Usage:
 python swe_bench_pro_eval.py \
     --raw_sample_path=data.csv \
@@ -17,14 +21,28 @@ python swe_bench_pro_eval.py \
     --scripts_dir=run_scripts \
     --num_workers=100 \
     --dockerhub_username=your-username
+
+For quick checks on one workstation, add ``--use_local_docker
+--reuse_sandboxes``: images already present are not pulled again, and each
+image keeps warm containers that are reset between evals.
 """
 
 import argparse
+import asyncio
+import base64
 import concurrent.futures
+import functools
+import io
 import json
 import os
 import platform as py_platform
+import re
 import sys
+import tarfile
+import threading
+import time
+import urllib.error
+import urllib.request
 
 try:
     import modal
@@ -65,13 +83,13 @@ def get_dockerhub_image_uri(uid: str, dockerhub_username: str, dockerhub_repo: s
 
 # ---- Docker helpers ----
 
-def load_base_docker(iid):
-    with open(f"dockerfiles/base_dockerfile/{iid}/Dockerfile") as fp:
+def load_base_docker(iid, dockerfiles_dir="dockerfiles"):
+    with open(os.path.join(dockerfiles_dir, "base_dockerfile", iid, "Dockerfile")) as fp:
         return fp.read()
 
 
-def instance_docker(iid):
-    with open(f"dockerfiles/instance_dockerfile/{iid}/Dockerfile") as fp:
+def instance_docker(iid, dockerfiles_dir="dockerfiles"):
+    with open(os.path.join(dockerfiles_dir, "instance_dockerfile", iid, "Dockerfile")) as fp:
         return fp.read()
 
 
@@ -83,7 +101,7 @@ def load_local_script(scripts_dir, instance_id, script_name):
         return f.read()
 
 
-def create_entryscript(sample):
+def create_entryscript(sample, dockerfiles_dir="dockerfiles"):
     before_repo_set_cmd = sample["before_repo_set_cmd"].strip().split("\n")[-1]
     raw_test_files = sample["selected_test_files_to_run"]
     try:
@@ -96,8 +114,8 @@ def create_entryscript(sample):
         # Fallback: treat bare string as a single test file path
         selected_test_files_to_run = raw_test_files
     base_commit = sample["base_commit"]
-    base_dockerfile = load_base_docker(sample["repo_name"])
-    instance_dockerfile = instance_docker(sample["instance_id"])
+    base_dockerfile = load_base_docker(sample["repo_name"], dockerfiles_dir)
+    instance_dockerfile = instance_docker(sample["instance_id"], dockerfiles_dir)
 
     env_cmds = []
     for dockerfile_content in [base_dockerfile, instance_dockerfile]:
@@ -185,15 +203,24 @@ def prepare_run(uid, output_dir, prefix, redo, attempt=None):
     return None, output_path, workspace_dir, uid_dir
 
 
+def resolve_image_uri(sample, dockerhub_username, dockerhub_repo):
+    # Use image_name from instances.yaml if available, otherwise construct it
+    if "image_name" in sample and sample["image_name"]:
+        return sample["image_name"]
+    return get_dockerhub_image_uri(
+        sample["instance_id"], dockerhub_username, dockerhub_repo, sample.get("repo", "")
+    )
+
+
 def write_patch_snapshot(uid_dir, prefix, patch):
     with open(os.path.join(uid_dir, f"{prefix}_patch.diff"), "w") as f:
         f.write(patch)
 
 
-def assemble_workspace_files(uid, scripts_dir, patch, sample):
+def assemble_workspace_files(uid, scripts_dir, patch, sample, dockerfiles_dir="dockerfiles"):
     run_script = load_local_script(scripts_dir, uid, "run_script.sh")
     parser_script = load_local_script(scripts_dir, uid, "parser.py")
-    entryscript_content = create_entryscript(sample)
+    entryscript_content = create_entryscript(sample, dockerfiles_dir)
 
     files = {
         "patch.diff": patch,
@@ -204,10 +231,29 @@ def assemble_workspace_files(uid, scripts_dir, patch, sample):
     return files, entryscript_content
 
 
-def write_files_modal(sandbox, files):
-    for rel_path, content in files.items():
-        with sandbox.open(f"/workspace/{rel_path}", "w") as f:
-            f.write(content)
+def eval_cache_key(cache, patch, sample, scripts_dir, image_digest, dockerfiles_dir="dockerfiles"):
+    """Key for ``cache`` covering everything that determines the test output.
+
+    ``image_digest`` identifies the image content the eval runs in (registry
+    digest or local image ID), never a tag that can be pushed again.
+    """
+    files, _ = assemble_workspace_files(sample["instance_id"], scripts_dir, patch, sample, dockerfiles_dir)
+    return cache.key(
+        image_digest=image_digest,
+        base_commit=sample["base_commit"],
+        patch=patch,
+        run_script=files["run_script.sh"],
+        parser=files["parser.py"],
+        entryscript=files["entryscript.sh"],
+    )
+
+
+def save_cached_output(output_dir, uid, prefix, attempt, patch, output):
+    """Write a cache hit's output where a real evaluation would have put it."""
+    _, output_path, _, uid_dir = prepare_run(uid, output_dir, prefix, True, attempt=attempt)
+    write_patch_snapshot(uid_dir, prefix, patch)
+    with open(output_path, "w") as f:
+        json.dump(output, f)
 
 
 def write_files_local(workspace_dir, files):
@@ -222,31 +268,113 @@ def save_entryscript_copy(uid_dir, prefix, entryscript_content):
         f.write(entryscript_content if entryscript_content is not None else "")
 
 
-def collect_outputs_modal(sandbox, uid_dir, uid, prefix):
-    try:
-        with sandbox.open("/workspace/stdout.log", "r") as f_in:
-            with open(os.path.join(uid_dir, f"{prefix}_stdout.log"), "w") as f:
-                stdout_content = f_in.read()
-                f.write(stdout_content if stdout_content is not None else "")
-    except FileNotFoundError:
-        pass
-    try:
-        with sandbox.open("/workspace/stderr.log", "r") as f_in:
-            with open(os.path.join(uid_dir, f"{prefix}_stderr.log"), "w") as f:
-                stderr_content = f_in.read()
-                f.write(stderr_content if stderr_content is not None else "")
-    except FileNotFoundError:
-        pass
+# Largest stdout/stderr log brought back from an eval sandbox; the tail is kept
+LOG_SIZE_CAP = 2 * 1024 * 1024
+
+# Runs the entryscript and prints the logs and output.json as one base64 tar.gz
+RUN_AND_BUNDLE = """
+bash /workspace/entryscript.sh > /dev/null 2>&1
+rc=$?
+cd /workspace
+files=""
+for f in stdout.log stderr.log output.json tree.sha; do
+    [ -f "$f" ] || continue
+    if [ "$f" != output.json ] && [ "$(wc -c < "$f")" -gt {cap} ]; then
+        {{ echo "[anvil] log truncated to its last {cap} bytes"; tail -c {cap} "$f"; }} > "$f.tmp"
+        mv "$f.tmp" "$f"
+    fi
+    files="$files $f"
+done
+[ -n "$files" ] && tar -cz $files | base64
+exit $rc
+"""
 
-    try:
-        with sandbox.open("/workspace/output.json", "r") as f_in:
-            output = json.load(f_in)
-            with open(os.path.join(uid_dir, f"{prefix}_output.json"), "w") as f:
-                json.dump(output, f)
-            return output
-    except FileNotFoundError:
+# Entrypoint of an eval sandbox. The workspace arrives as a base64 tar.gz on
+# stdin, and the outputs leave as one on stdout, so an eval costs no file or
+# exec round trips beyond creating the sandbox.
+EVAL_ENTRYPOINT = """
+mkdir -p /workspace
+base64 -d | tar -xz -C /workspace || exit 1
+""" + RUN_AND_BUNDLE
+
+# One eval in a reused sandbox. /app is reset to base_commit and cleaned as the
+# entryscript would, then hashed into tree.sha before the patch is applied: the
+# commit, untracked and ignored files, and the contents of every tracked file
+# (which git status would miss for files flagged assume-unchanged). The caller
+# compares it with the hash from the sandbox's first run. Local containers get
+# the workspace through put_archive and run CLEAN_TREE_AND_BUNDLE alone.
+CLEAN_TREE_AND_BUNDLE = """
+(cd /app && git reset -q --hard {base_commit} && git clean -qfdx \\
+    && {{ git rev-parse HEAD; git status --porcelain --ignored --untracked-files=all; \\
+          git ls-files -z | xargs -0 -r sha256sum 2>&1; }} \\
+    | sha256sum | cut -c1-64 > /workspace/tree.sha)
+""" + RUN_AND_BUNDLE
+WARM_EVAL_SCRIPT = """
+rm -rf /workspace && mkdir -p /workspace
+base64 -d | tar -xz -C /workspace || exit 1
+""" + CLEAN_TREE_AND_BUNDLE
+
+SANDBOX_RESOURCES = {"cpu": (1, 4), "memory": (5 * 1024, 30 * 1024)}
+# Lifetime of a reused eval sandbox, and how long it may sit idle between attempts
+WARM_SANDBOX_TIMEOUT = 4 * 60 * 60
+WARM_SANDBOX_IDLE_TIMEOUT = 10 * 60
+# Idle sandboxes (or local containers) kept per instance, and in total
+WARM_POOL_PER_INSTANCE = 2
+WARM_POOL_TOTAL = 64
+
+
+def _warm_pool_has_room(pools, key):
+    """Whether ``pools`` (key -> idle list) can take one more idle sandbox for ``key``."""
+    return (
+        len(pools.get(key, ())) < WARM_POOL_PER_INSTANCE
+        and sum(len(pool) for pool in pools.values()) < WARM_POOL_TOTAL
+    )
+
+
+def workspace_archive(files):
+    """The workspace files as a tar.gz."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for rel_path, content in files.items():
+            data = (content or "").encode()
+            info = tarfile.TarInfo(rel_path)
+            info.size = len(data)
+            info.mode = 0o755
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def pack_workspace(files):
+    """The workspace files as a base64-encoded tar.gz."""
+    return base64.b64encode(workspace_archive(files)).decode()
+
+
+def unpack_outputs(bundle):
+    """Map file name to contents for the base64 tar.gz an eval sandbox printed."""
+    if not bundle.strip():
+        return {}
+    outputs = {}
+    with tarfile.open(fileobj=io.BytesIO(base64.b64decode(bundle)), mode="r:gz") as tar:
+        for member in tar.getmembers():
+            f = tar.extractfile(member)
+            if f is not None:
+                outputs[os.path.basename(member.name)] = f.read().decode(errors="replace")
+    return outputs
+
+
+def save_outputs(outputs, uid_dir, uid, prefix):
+    for name in ("stdout.log", "stderr.log"):
+        if name in outputs:
+            with open(os.path.join(uid_dir, f"{prefix}_{name}"), "w") as f:
+                f.write(outputs[name])
+
+    if "output.json" not in outputs:
         print(f"Warning: output.json not found for {uid}")
         return None
+    output = json.loads(outputs["output.json"])
+    with open(os.path.join(uid_dir, f"{prefix}_output.json"), "w") as f:
+        json.dump(output, f)
+    return output
 
 
 def collect_outputs_local(workspace_dir, uid_dir, uid, prefix):
@@ -275,10 +403,291 @@ def collect_outputs_local(workspace_dir, uid_dir, uid, prefix):
         return None
 
 
-def eval_with_modal(
+def registry_secret_from_env():
+    """Registry credentials for private Docker Hub images, if set."""
+    if os.environ.get("REGISTRY_USERNAME") and os.environ.get("REGISTRY_PASSWORD"):
+        return modal.Secret.from_dict({
+            "REGISTRY_USERNAME": os.environ["REGISTRY_USERNAME"],
+            "REGISTRY_PASSWORD": os.environ["REGISTRY_PASSWORD"],
+        })
+    return None
+
+
+# ---- Registry digests and the eval image cache ----
+
+MANIFEST_MEDIA_TYPES = ", ".join([
+    "application/vnd.oci.image.index.v1+json",
+    "application/vnd.docker.distribution.manifest.list.v2+json",
+    "application/vnd.oci.image.manifest.v1+json",
+    "application/vnd.docker.distribution.manifest.v2+json",
+])
+
+
+def parse_image_ref(image_uri):
+    """Split an image reference into (registry host, repository, tag or digest)."""
+    name, _, digest = image_uri.partition("@")
+    host, _, rest = name.partition("/")
+    if not rest or not ("." in host or ":" in host or host == "localhost"):
+        host, rest = "registry-1.docker.io", name
+        if "/" not in rest:
+            rest = f"library/{rest}"
+    repository, _, tag = rest.rpartition(":") if ":" in rest else (rest, "", "latest")
+    return host, repository, digest or tag
+
+
+def _registry_token(challenge, credentials):
+    """Bearer token for a registry's ``WWW-Authenticate`` challenge."""
+    params = dict(re.findall(r'(\w+)="([^"]*)"', challenge))
+    url = params.pop("realm")
+    url += "?" + "&".join(f"{k}={v}" for k, v in params.items())
+    request = urllib.request.Request(url)
+    if credentials:
+        basic = base64.b64encode(":".join(credentials).encode()).decode()
+        request.add_header("Authorization", f"Basic {basic}")
+    with urllib.request.urlopen(request, timeout=10) as resp:
+        body = json.loads(resp.read())
+    return body.get("token") or body.get("access_token")
+
+
+def registry_digest(image_uri, credentials=None):
+    """Content digest the registry currently serves for an image tag, or None.
+
+    Pinned references (``name@sha256:...``) are returned as is. Any registry
+    or network error gives None, so callers can fall back to the tag.
+    """
+    host, repository, reference = parse_image_ref(image_uri)
+    if reference.startswith("sha256:"):
+        return reference
+    url = f"https://{host}/v2/{repository}/manifests/{reference}"
+    headers = {"Accept": MANIFEST_MEDIA_TYPES}
+    try:
+        for _ in range(2):
+            request = urllib.request.Request(url, headers=headers, method="HEAD")
+            try:
+                with urllib.request.urlopen(request, timeout=10) as resp:
+                    return resp.headers.get("Docker-Content-Digest")
+            except urllib.error.HTTPError as e:
+                challenge = e.headers.get("WWW-Authenticate", "")
+                if e.code != 401 or not challenge.startswith("Bearer") or "Authorization" in headers:
+                    return None
+                headers["Authorization"] = f"Bearer {_registry_token(challenge, credentials)}"
+    except Exception:
+        return None
+    return None
+
+
+def pinned_image_ref(image_uri, digest):
+    """``image_uri`` with its tag replaced by ``digest`` (``name@sha256:...``)."""
+    name = image_uri.partition("@")[0]
+    if ":" in name.rpartition("/")[2]:
+        name = name.rpartition(":")[0]
+    return f"{name}@{digest}"
+
+
+def registry_credentials_from_env():
+    """(username, password) for registry lookups from the environment, or None."""
+    if os.environ.get("REGISTRY_USERNAME") and os.environ.get("REGISTRY_PASSWORD"):
+        return (os.environ["REGISTRY_USERNAME"], os.environ["REGISTRY_PASSWORD"])
+    return None
+
+
+class EvalSession:
+    """Modal handles and derived eval images shared by every eval in a process.
+
+    Each image tag's registry digest is resolved once, and the sandbox image
+    is pinned to ``name@digest``. Built image IDs are kept per digest, in
+    ``index_path`` if given, so a derived image is only rebuilt once the
+    registry serves a new digest for the tag. When the digest can't be
+    resolved, the image is built from the tag once per process, forcing a
+    rebuild so an updated tag is never served stale.
+
+    With ``reuse_sandboxes``, each instance keeps a pool of idle eval
+    sandboxes, and ``run_warm`` evaluates later attempts in one of them
+    instead of a fresh sandbox. A reused sandbox is only trusted if the
+    hash of its reset /app matches the hash from its first, fresh run.
+    The pool is capped at ``WARM_POOL_PER_INSTANCE`` sandboxes per instance
+    and ``WARM_POOL_TOTAL`` overall; a sandbox returned to a full pool is
+    terminated. Call ``close`` to terminate the pool.
+    """
+
+    def __init__(self, app, registry_secret=None, index_path=None, reuse_sandboxes=False):
+        self.app = app
+        self.registry_secret = registry_secret
+        self.index_path = index_path
+        self.reuse_sandboxes = reuse_sandboxes
+        # instance_id -> idle [sandbox, clean tree hash] pairs
+        self._warm = {}
+        self._index = self._load_index()
+        self._digests = {}
+        self._images = {}
+        self._locks = {}
+        self._file_lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.unpinned = 0
+        self.warm_reused = 0
+        self.warm_discarded = 0
+
+    @classmethod
+    async def open(cls, app=None, registry_secret=None, index_path=None, reuse_sandboxes=False):
+        if modal is None:
+            raise RuntimeError("modal is not installed")
+        if app is None:
+            app = await modal.App.lookup.aio(name="anvil-swe-bench-eval", create_if_missing=True)
+        if registry_secret is None:
+            registry_secret = registry_secret_from_env()
+        return cls(app, registry_secret, index_path, reuse_sandboxes)
+
+    def _load_index(self):
+        if self.index_path is None:
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self):
+        if self.index_path is None:
+            return
+        with self._file_lock:
+            os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+            tmp = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self._index, f, indent=2)
+            os.replace(tmp, self.index_path)
+
+    async def digest(self, image_uri):
+        """Registry digest of ``image_uri``, resolved at most once per process."""
+        if image_uri not in self._digests:
+            self._digests[image_uri] = await asyncio.to_thread(
+                registry_digest, image_uri, registry_credentials_from_env()
+            )
+        return self._digests[image_uri]
+
+    async def image(self, image_uri):
+        """Sandbox image for ``image_uri``, built at most once per registry digest."""
+        lock = self._locks.setdefault(image_uri, asyncio.Lock())
+        async with lock:
+            digest = await self.digest(image_uri)
+            key = digest or image_uri
+            if key in self._images:
+                self.hits += 1
+                return self._images[key]
+
+            entry = self._index.get(digest) if digest else None
+            if entry:
+                try:
+                    image = modal.Image.from_id(entry["image_id"])
+                    await image.hydrate.aio()
+                    self._images[key] = image
+                    self.hits += 1
+                    return image
+                except Exception:
+                    # Image was garbage-collected on Modal's side; rebuild below
+                    self._index.pop(digest, None)
+
+            if digest:
+                image = modal.Image.from_registry(
+                    pinned_image_ref(image_uri, digest), secret=self.registry_secret,
+                )
+            else:
+                self.unpinned += 1
+                image = modal.Image.from_registry(
+                    image_uri, secret=self.registry_secret, force_build=True,
+                )
+            image = image.dockerfile_commands(['CMD ["sleep", "infinity"]'])
+            await image.build.aio(self.app)
+            self.builds += 1
+            self._images[key] = image
+            if digest:
+                self._index[digest] = {
+                    "image_id": image.object_id,
+                    "image_name": image_uri,
+                    "created_at": time.time(),
+                }
+                self._save_index()
+            return image
+
+    async def run_warm(self, uid, image, payload, base_commit, block_network=False):
+        """Evaluate ``payload`` in an idle sandbox of this instance, or a new one.
+
+        Returns (outputs, returncode), or None if a reused sandbox failed the
+        clean-tree check or broke, in which case it has been terminated and
+        the caller should evaluate in a fresh sandbox.
+        """
+        pool = self._warm.get(uid)
+        reused = bool(pool)
+        if reused:
+            sandbox, clean_tree = pool.pop()
+        else:
+            sandbox = await modal.Sandbox.create.aio(
+                image=image, app=self.app, timeout=WARM_SANDBOX_TIMEOUT,
+                idle_timeout=WARM_SANDBOX_IDLE_TIMEOUT, block_network=block_network,
+                **SANDBOX_RESOURCES,
+            )
+            clean_tree = None
+        try:
+            process = await sandbox.exec.aio(
+                "bash", "-c",
+                WARM_EVAL_SCRIPT.format(base_commit=base_commit, cap=LOG_SIZE_CAP),
+            )
+            process.stdin.write(payload)
+            process.stdin.write_eof()
+            await process.stdin.drain.aio()
+            bundle = await process.stdout.read.aio()
+            returncode = await process.wait.aio()
+            outputs = unpack_outputs(bundle)
+        except Exception:
+            if not reused:
+                await self._terminate(sandbox)
+                raise
+            outputs = None
+        tree = (outputs or {}).pop("tree.sha", "").strip()
+        if reused and (outputs is None or not tree or tree != clean_tree):
+            self.warm_discarded += 1
+            await self._terminate(sandbox)
+            return None
+        if reused:
+            self.warm_reused += 1
+        if tree and _warm_pool_has_room(self._warm, uid):
+            self._warm.setdefault(uid, []).append((sandbox, tree))
+        else:
+            # No hash to check later runs against, or the pool is full
+            await self._terminate(sandbox)
+        return outputs, returncode
+
+    async def _terminate(self, sandbox):
+        try:
+            await sandbox.terminate.aio()
+        except Exception:
+            pass
+
+    async def close(self):
+        """Terminate the idle sandboxes kept for reuse."""
+        pools, self._warm = self._warm, {}
+        await asyncio.gather(*(
+            self._terminate(sandbox) for pool in pools.values() for sandbox, _ in pool
+        ))
+
+
+async def eval_with_modal(
     patch, sample, output_dir, dockerhub_username, scripts_dir, dockerhub_repo,
     prefix="", redo=False, block_network=False, docker_platform=None, attempt=None,
+    dockerfiles_dir="dockerfiles", session=None,
 ):
+    """Evaluate one patch in a Modal sandbox through the client's asyncio API.
+
+    Nothing here blocks a thread while the sandbox runs, so one event loop
+    can keep thousands of evals in flight. Pass an ``EvalSession`` to share
+    the app, registry secret and built images between evals. The sandbox
+    runs ``EVAL_ENTRYPOINT``, so the workspace goes in and the outputs come
+    back through its stdin and stdout. If the session reuses sandboxes, the
+    patch is evaluated in a warm sandbox of its instance where possible.
+
+    Returns (output, returncode); returncode is the entryscript's exit status,
+    or None when an earlier run's output was reused.
+    """
     if modal is None:
         raise RuntimeError("modal is not installed")
     uid = sample["instance_id"]
@@ -286,68 +695,199 @@ def eval_with_modal(
         uid, output_dir, prefix, redo, attempt=attempt
     )
     if existing_output is not None:
-        return existing_output
+        return existing_output, None
 
     sandbox = None
-    
+
     try:
         write_patch_snapshot(uid_dir, prefix, patch)
-        files, entryscript_content = assemble_workspace_files(uid, scripts_dir, patch, sample)
-
-        app = modal.App.lookup(name="anvil-swe-bench-eval", create_if_missing=True)
-        
-        # Use image_name from instances.yaml if available, otherwise construct it
-        if "image_name" in sample and sample["image_name"]:
-            dockerhub_image_uri = sample["image_name"]
-        else:
-            dockerhub_image_uri = get_dockerhub_image_uri(uid, dockerhub_username, dockerhub_repo, sample.get("repo", ""))
-
-        # Registry credentials for private Docker Hub images
-        registry_secret = None
-        if os.environ.get("REGISTRY_USERNAME") and os.environ.get("REGISTRY_PASSWORD"):
-            registry_secret = modal.Secret.from_dict({
-                "REGISTRY_USERNAME": os.environ["REGISTRY_USERNAME"],
-                "REGISTRY_PASSWORD": os.environ["REGISTRY_PASSWORD"],
-            })
-
-        image = modal.Image.from_registry(
-            dockerhub_image_uri, secret=registry_secret, force_build=True,
-        ).dockerfile_commands(['CMD ["sleep", "infinity"]'])
-
-        sandbox = modal.Sandbox.create(
-            image=image, app=app, timeout=60 * 60,
-            cpu=(1, 4), memory=(5 * 1024, 30 * 1024), block_network=block_network,
+        files, entryscript_content = assemble_workspace_files(
+            uid, scripts_dir, patch, sample, dockerfiles_dir
         )
 
-        process = sandbox.exec("mkdir", "-p", "/workspace")
-        process.wait()
-        write_files_modal(sandbox, files)
-        process = sandbox.exec("bash", "/workspace/entryscript.sh")
-        process.wait()
-
-        if process.returncode != 0:
-            print(f"Entryscript failed for {uid} with return code: {process.returncode}")
+        if session is None:
+            session = await EvalSession.open()
+        dockerhub_image_uri = resolve_image_uri(sample, dockerhub_username, dockerhub_repo)
+        image = await session.image(dockerhub_image_uri)
+        payload = pack_workspace(files)
 
-        output = collect_outputs_modal(sandbox, uid_dir, uid, prefix)
+        result = None
+        if session.reuse_sandboxes:
+            result = await session.run_warm(
+                uid, image, payload, sample["base_commit"], block_network
+            )
+        if result is None:
+            sandbox = await modal.Sandbox.create.aio(
+                "bash", "-c", EVAL_ENTRYPOINT.format(cap=LOG_SIZE_CAP),
+                image=image, app=session.app, timeout=60 * 60,
+                block_network=block_network, **SANDBOX_RESOURCES,
+            )
+            sandbox.stdin.write(payload)
+            sandbox.stdin.write_eof()
+            await sandbox.stdin.drain.aio()
+            bundle = await sandbox.stdout.read.aio()
+            await sandbox.wait.aio()
+            result = unpack_outputs(bundle), sandbox.returncode
+        outputs, returncode = result
+
+        if returncode != 0:
+            print(f"Entryscript failed for {uid} with return code: {returncode}")
+
+        output = save_outputs(outputs, uid_dir, uid, prefix)
         if output is None:
-            return None
+            return None, returncode
         save_entryscript_copy(uid_dir, prefix, entryscript_content)
-        return output
+        return output, returncode
     except Exception as e:
         print(f"Error evaluating {uid}: {e}")
         raise
     finally:
         if sandbox:
             try:
-                sandbox.terminate()
+                await sandbox.terminate.aio()
             except Exception:
                 pass
 
 
+class DockerSession:
+    """Docker client, image pulls and reusable containers for local evals.
+
+    Local evals run on threads, so everything here is thread-safe. An image
+    is only pulled if it isn't present, and concurrent evals of one image
+    wait on a single pull. With ``reuse_containers``, each image keeps a
+    pool of idle long-lived containers that ``run_warm`` evaluates in via
+    ``exec``, with the same clean-tree check and pool caps as
+    ``EvalSession.run_warm``. Call ``close`` to remove them.
+    """
+
+    def __init__(self, platform=None, reuse_containers=False):
+        if docker is None:
+            raise RuntimeError("docker SDK is not installed")
+        self.client = docker.from_env()
+        self.platform = platform
+        self.reuse_containers = reuse_containers
+        self._lock = threading.Lock()
+        self._pulls = {}
+        # image -> idle [container, clean tree hash] pairs
+        self._idle = {}
+        self.pulled = 0
+        self.warm_reused = 0
+        self.warm_discarded = 0
+
+    def ensure_image(self, image_uri):
+        """Pull ``image_uri`` unless it is present, once however many evals ask."""
+        with self._lock:
+            pull = self._pulls.get(image_uri)
+            owner = pull is None
+            if owner:
+                pull = self._pulls[image_uri] = concurrent.futures.Future()
+        if owner:
+            try:
+                try:
+                    self.client.images.get(image_uri)
+                except docker.errors.ImageNotFound:
+                    if self.platform:
+                        self.client.images.pull(image_uri, platform=self.platform)
+                    else:
+                        self.client.images.pull(image_uri)
+                    self.pulled += 1
+                pull.set_result(None)
+            except Exception as e:
+                # Let a later eval try again
+                with self._lock:
+                    self._pulls.pop(image_uri, None)
+                pull.set_exception(e)
+        pull.result()
+
+    def image_id(self, image_uri):
+        """Content ID of the local image evals of ``image_uri`` run in, or None."""
+        try:
+            self.ensure_image(image_uri)
+            return self.client.images.get(image_uri).id
+        except Exception:
+            return None
+
+    def run_kwargs(self, block_network=False):
+        kwargs = {"detach": True}
+        if block_network:
+            kwargs["network_mode"] = "none"
+        if self.platform:
+            kwargs["platform"] = self.platform
+        return kwargs
+
+    def run_warm(self, image_uri, files, base_commit, block_network=False):
+        """Evaluate ``files`` in an idle container of this image, or a new one.
+
+        Returns (outputs, exit code), or None if a reused container failed the
+        clean-tree check or broke, in which case it has been removed and the
+        caller should evaluate in a fresh container.
+        """
+        with self._lock:
+            pool = self._idle.get(image_uri)
+            reused = bool(pool)
+            if reused:
+                container, clean_tree = pool.pop()
+        if not reused:
+            container = self.client.containers.run(
+                image_uri, entrypoint=["sleep", "infinity"], labels={"anvil-eval": "warm"},
+                **self.run_kwargs(block_network),
+            )
+            clean_tree = None
+        try:
+            container.exec_run(["bash", "-c", "rm -rf /workspace && mkdir -p /workspace"])
+            container.put_archive("/workspace", workspace_archive(files))
+            exit_code, (stdout, _) = container.exec_run(
+                ["bash", "-c", CLEAN_TREE_AND_BUNDLE.format(base_commit=base_commit, cap=LOG_SIZE_CAP)],
+                demux=True,
+            )
+            outputs = unpack_outputs((stdout or b"").decode())
+        except Exception:
+            if not reused:
+                self._remove(container)
+                raise
+            outputs = None
+        tree = (outputs or {}).pop("tree.sha", "").strip()
+        if reused and (outputs is None or not tree or tree != clean_tree):
+            self.warm_discarded += 1
+            self._remove(container)
+            return None
+        if reused:
+            self.warm_reused += 1
+        with self._lock:
+            keep = bool(tree) and _warm_pool_has_room(self._idle, image_uri)
+            if keep:
+                self._idle.setdefault(image_uri, []).append((container, tree))
+        if not keep:
+            # No hash to check later runs against, or the pool is full
+            self._remove(container)
+        return outputs, exit_code
+
+    def _remove(self, container):
+        try:
+            container.remove(force=True)
+        except Exception:
+            pass
+
+    def close(self):
+        """Remove the idle containers kept for reuse."""
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for pool in pools.values():
+            for container, _ in pool:
+                self._remove(container)
+
+
 def eval_with_docker(
     patch, sample, output_dir, dockerhub_username, scripts_dir, dockerhub_repo,
     prefix="", redo=False, block_network=False, docker_platform=None, attempt=None,
+    dockerfiles_dir="dockerfiles", session=None,
 ):
+    """Evaluate one patch in a local Docker container.
+
+    Pass a ``DockerSession`` to share the client, image pulls and, if it
+    reuses containers, warm containers between evals. Returns (output,
+    returncode) like ``eval_with_modal``.
+    """
     if docker is None:
         raise RuntimeError("docker SDK is not installed")
     uid = sample["instance_id"]
@@ -355,37 +895,44 @@ def eval_with_docker(
         uid, output_dir, prefix, redo, attempt=attempt
     )
     if existing_output is not None:
-        return existing_output
+        return existing_output, None
 
     try:
-        files, entryscript_content = assemble_workspace_files(uid, scripts_dir, patch, sample)
-        write_files_local(workspace_dir, files)
+        files, entryscript_content = assemble_workspace_files(
+            uid, scripts_dir, patch, sample, dockerfiles_dir
+        )
         write_patch_snapshot(uid_dir, prefix, patch)
 
-        # Use image_name from instances.yaml if available, otherwise construct it
-        if "image_name" in sample and sample["image_name"]:
-            dockerhub_image_uri = sample["image_name"]
-        else:
-            dockerhub_image_uri = get_dockerhub_image_uri(uid, dockerhub_username, dockerhub_repo, sample.get("repo", ""))
+        dockerhub_image_uri = resolve_image_uri(sample, dockerhub_username, dockerhub_repo)
 
-        client = docker.from_env()
-        if docker_platform:
-            client.images.pull(dockerhub_image_uri, platform=docker_platform)
-        else:
-            client.images.pull(dockerhub_image_uri)
+        if session is None:
+            session = DockerSession(docker_platform)
+        session.ensure_image(dockerhub_image_uri)
+
+        if session.reuse_containers:
+            result = session.run_warm(
+                dockerhub_image_uri, files, sample["base_commit"], block_network
+            )
+            if result is not None:
+                outputs, status_code = result
+                if status_code != 0:
+                    print(f"Entryscript failed for {uid} with return code: {status_code}")
+                output = save_outputs(outputs, uid_dir, uid, prefix)
+                if output is None:
+                    return None, status_code
+                save_entryscript_copy(uid_dir, prefix, entryscript_content)
+                return output, status_code
 
+        write_files_local(workspace_dir, files)
         abs_workspace_dir = os.path.abspath(workspace_dir)
         volumes = {abs_workspace_dir: {"bind": "/workspace", "mode": "rw"}}
         run_kwargs = {
-            "volumes": volumes, "detach": True, "remove": True,
+            "volumes": volumes, "remove": True,
             "entrypoint": "/bin/bash", "command": ["-c", "bash /workspace/entryscript.sh"],
+            **session.run_kwargs(block_network),
         }
-        if block_network:
-            run_kwargs["network_mode"] = "none"
-        if docker_platform:
-            run_kwargs["platform"] = docker_platform
 
-        container = client.containers.run(dockerhub_image_uri, **run_kwargs)
+        container = session.client.containers.run(dockerhub_image_uri, **run_kwargs)
         result = container.wait()
         status_code = result.get("StatusCode", 1) if isinstance(result, dict) else 1
         if status_code != 0:
@@ -393,42 +940,32 @@ def eval_with_docker(
 
         output = collect_outputs_local(workspace_dir, uid_dir, uid, prefix)
         if output is None:
-            return None
+            return None, status_code
         save_entryscript_copy(uid_dir, prefix, entryscript_content)
-        return output
+        return output, status_code
     except Exception as e:
         raise
 
 
-def parse_args():
-    parser = argparse.ArgumentParser(description="Run SWE-bench Pro evaluations")
-    parser.add_argument("--raw_sample_path", required=True)
-    parser.add_argument("--patch_path", required=True)
-    parser.add_argument("--output_dir", required=True)
-    parser.add_argument("--dockerhub_username", required=True)
-    parser.add_argument("--dockerhub_repo", required=True)
-    parser.add_argument("--scripts_dir", required=True)
-    parser.add_argument("--use_local_docker", action="store_true")
-    parser.add_argument("--docker_platform", default=None)
-    parser.add_argument("--redo", action="store_true")
-    parser.add_argument("--num_workers", type=int, default=50)
-    parser.add_argument("--block_network", action="store_true")
-    return parser.parse_args()
-
+# ---- Importable API ----
 
-def main():
-    args = parse_args()
+def load_samples(raw_sample_path):
+    """Load task rows indexed by instance_id.
 
-    if args.raw_sample_path.endswith(".jsonl"):
-        raw_sample_df = pd.read_json(args.raw_sample_path, lines=True)
+    image_name and repo_name are filled in from an instances.yaml next to the
+    sample file when it exists.
+    """
+    raw_sample_path = str(raw_sample_path)
+    if raw_sample_path.endswith(".jsonl"):
+        raw_sample_df = pd.read_json(raw_sample_path, lines=True)
     else:
-        raw_sample_df = pd.read_csv(args.raw_sample_path)
+        raw_sample_df = pd.read_csv(raw_sample_path)
 
     raw_sample_df = raw_sample_df.fillna("")
     raw_sample_df = raw_sample_df.set_index("instance_id", drop=False)
-    
+
     # Load instances.yaml to get image_name and repo_name fields if they exist
-    instances_yaml_path = os.path.join(os.path.dirname(args.raw_sample_path), "instances.yaml")
+    instances_yaml_path = os.path.join(os.path.dirname(raw_sample_path), "instances.yaml")
     if os.path.exists(instances_yaml_path):
         try:
             import yaml
@@ -443,9 +980,241 @@ def main():
         except Exception as e:
             print(f"Warning: Could not load fields from instances.yaml: {e}")
 
+    return raw_sample_df
+
+
+def grade(output, sample):
+    """A patch passes when every fail_to_pass and pass_to_pass test passed."""
+    if output is None:
+        return False
+    passed_tests = {x["name"] for x in output["tests"] if x["status"] == "PASSED"}
+    f2p = set(eval(sample["fail_to_pass"]))
+    p2p = set(eval(sample["pass_to_pass"]))
+    return (f2p | p2p) <= passed_tests
+
+
+def result_key(patch_sample):
+    instance_id = patch_sample["instance_id"]
+    attempt = patch_sample.get("attempt")
+    return f"{instance_id}:attempt_{attempt}" if attempt else instance_id
+
+
+def record_result(output_dir, instance_id, attempt, passed):
+    """Persist a per-attempt result (pass or fail) so it's not retried on resume."""
+    if attempt is None:
+        return
+    task_results_dir = os.path.join(output_dir, instance_id, f"attempt_{attempt}", "eval_results")
+    os.makedirs(task_results_dir, exist_ok=True)
+    with open(os.path.join(task_results_dir, "eval_results.json"), "w") as f:
+        json.dump({instance_id: passed}, f)
+
+
+async def _aiter(patches):
+    if hasattr(patches, "__aiter__"):
+        async for patch_sample in patches:
+            yield patch_sample
+    else:
+        for patch_sample in patches:
+            yield patch_sample
+
+
+async def evaluate_patches(
+    patches, samples, output_dir, scripts_dir, dockerhub_username, dockerhub_repo,
+    num_workers=50, use_local_docker=False, docker_platform=None, block_network=False,
+    redo=False, dockerfiles_dir="dockerfiles", session=None, cache=None,
+    reuse_sandboxes=False, semaphore=None,
+):
+    """Evaluate patches concurrently, yielding (patch_sample, passed) as each finishes.
+
+    ``patches`` is an iterable or async iterable of patch dicts (instance_id,
+    patch, prefix, attempt), so a caller can keep feeding it while producing
+    patches. ``samples`` is the frame from ``load_samples``. Pass an
+    ``EvalSession`` to share the Modal app, registry secret and built eval
+    images with the caller; otherwise one is opened here for this call, and
+    ``reuse_sandboxes`` decides whether it keeps warm sandboxes per instance.
+    Local docker evals always share one ``DockerSession``, which reuses
+    containers per image under the same flag.
+
+    ``cache`` is an optional store of parsed test outputs with ``key(...)``,
+    ``get(key)`` and ``put(key, output)`` (see ``anvil.evals.cache.EvalCache``);
+    hits skip the sandbox entirely. Outputs are keyed on the image's registry
+    digest (local image ID for docker), and evals whose image can't be
+    resolved to one bypass the cache. Only outputs of runs whose entryscript
+    exited 0 are stored.
+
+    On Modal every eval is a coroutine on the caller's event loop, so
+    ``num_workers`` only bounds concurrency and can be in the thousands; local
+    docker evals still run on a thread each. Pass an ``asyncio.Semaphore`` as
+    ``semaphore`` to bound concurrency across several calls instead; it then
+    replaces the ``num_workers`` limit. Every yielded patch_sample gets
+    ``eval_queue_seconds`` (waiting for a worker slot) and, when it ran in a
+    sandbox, ``eval_seconds``.
+    """
+    owned_session = None
+    if use_local_docker:
+        eval_fn = eval_with_docker
+        if docker_platform is None and py_platform.machine().lower() in {"arm64", "aarch64"}:
+            docker_platform = "linux/amd64"
+        owned_session = DockerSession(docker_platform, reuse_containers=reuse_sandboxes)
+        extra = {"session": owned_session}
+    else:
+        if modal is None:
+            raise RuntimeError("modal is not installed")
+        eval_fn = eval_with_modal
+        if session is None:
+            session = owned_session = await EvalSession.open(reuse_sandboxes=reuse_sandboxes)
+        extra = {"session": session}
+        docker_platform = None
+
+    loop = asyncio.get_running_loop()
+    # The docker client blocks, so local evals get a thread each; Modal evals are coroutines
+    executor = (
+        concurrent.futures.ThreadPoolExecutor(max_workers=num_workers)
+        if use_local_docker else None
+    )
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(num_workers)
+    done = asyncio.Queue()
+
+    async def image_digest(sample):
+        image_uri = resolve_image_uri(sample, dockerhub_username, dockerhub_repo)
+        if use_local_docker:
+            return await loop.run_in_executor(executor, owned_session.image_id, image_uri)
+        return await session.digest(image_uri)
+
+    async def run_one(patch_sample, received):
+        patch_sample["eval_queue_seconds"] = time.monotonic() - received
+        instance_id = patch_sample["instance_id"]
+        attempt = patch_sample.get("attempt")
+        sample = samples.loc[instance_id]
+        patch = patch_sample.get("model_patch", patch_sample.get("patch", ""))
+        prefix = patch_sample.get("prefix", "")
+        try:
+            output = cache_key = None
+            digest = await image_digest(sample) if cache is not None else None
+            if digest is not None:
+                cache_key = await loop.run_in_executor(executor, functools.partial(
+                    eval_cache_key, cache, patch, sample, scripts_dir, digest, dockerfiles_dir,
+                ))
+                output = cache.get(cache_key)
+                if output is not None:
+                    save_cached_output(output_dir, instance_id, prefix, attempt, patch, output)
+            if output is None:
+                started = time.monotonic()
+                call = functools.partial(
+                    eval_fn,
+                    patch, sample, output_dir, dockerhub_username, scripts_dir, dockerhub_repo,
+                    prefix=prefix, redo=redo,
+                    block_network=block_network, docker_platform=docker_platform,
+                    attempt=attempt, dockerfiles_dir=dockerfiles_dir, **extra,
+                )
+                if executor is None:
+                    output, returncode = await call()
+                else:
+                    output, returncode = await loop.run_in_executor(executor, call)
+                patch_sample["eval_seconds"] = time.monotonic() - started
+                # Only clean runs; a failed entryscript may be flaky or infra-broken
+                if cache_key is not None and output is not None and returncode == 0:
+                    cache.put(cache_key, output)
+            passed = grade(output, sample)
+        except Exception as e:
+            print(f"Eval exception for {instance_id} (attempt {attempt}): {e}")
+            passed = False
+        finally:
+            semaphore.release()
+        record_result(output_dir, instance_id, attempt, passed)
+        await done.put((patch_sample, passed))
+
+    async def feed():
+        tasks = []
+        try:
+            async for patch_sample in _aiter(patches):
+                if patch_sample["instance_id"] not in samples.index:
+                    print(f"Warning: {patch_sample['instance_id']} not in raw sample data")
+                    continue
+                received = time.monotonic()
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(run_one(patch_sample, received)))
+            await asyncio.gather(*tasks)
+        finally:
+            await done.put(None)
+
+    feeder = asyncio.create_task(feed())
+    try:
+        while (item := await done.get()) is not None:
+            yield item
+        await feeder
+    finally:
+        feeder.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if isinstance(owned_session, DockerSession):
+            await asyncio.to_thread(owned_session.close)
+        elif owned_session is not None:
+            await owned_session.close()
+
+
+# ---- CLI ----
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run SWE-bench Pro evaluations")
+    parser.add_argument("--raw_sample_path", required=True)
+    parser.add_argument("--patch_path", required=True)
+    parser.add_argument("--output_dir", required=True)
+    parser.add_argument("--dockerhub_username", required=True)
+    parser.add_argument("--dockerhub_repo", required=True)
+    parser.add_argument("--scripts_dir", required=True)
+    parser.add_argument("--use_local_docker", action="store_true")
+    parser.add_argument("--docker_platform", default=None)
+    parser.add_argument("--redo", action="store_true")
+    parser.add_argument("--num_workers", type=int, default=50)
+    parser.add_argument("--block_network", action="store_true")
+    parser.add_argument("--reuse_sandboxes", action="store_true",
+                        help="Evaluate later attempts of an instance in its earlier, reset sandbox or container")
+    parser.add_argument("--results_path", default=None, help="Defaults to <output_dir>/eval_results.json")
+    return parser.parse_args()
+
+
+def _percentiles(values):
+    values = sorted(values)
+    return values[len(values) // 2], values[min(len(values) - 1, int(len(values) * 0.95))]
+
+
+async def _run(args, raw_sample_df, patches_to_run):
+    eval_results = {}
+    latency = {"queue": [], "run": []}
+    pbar = tqdm(total=len(patches_to_run), desc="Evals", unit="eval")
+    async for patch_sample, passed in evaluate_patches(
+        patches_to_run, raw_sample_df,
+        args.output_dir, args.scripts_dir, args.dockerhub_username, args.dockerhub_repo,
+        num_workers=args.num_workers, use_local_docker=args.use_local_docker,
+        docker_platform=args.docker_platform, block_network=args.block_network,
+        redo=args.redo, reuse_sandboxes=args.reuse_sandboxes,
+    ):
+        eval_results[result_key(patch_sample)] = passed
+        latency["queue"].append(patch_sample["eval_queue_seconds"])
+        if "eval_seconds" in patch_sample:
+            latency["run"].append(patch_sample["eval_seconds"])
+        status = "pass" if passed else "fail"
+        attempt = patch_sample.get("attempt")
+        instance_id = patch_sample["instance_id"]
+        task_label = f"{instance_id}:{attempt}" if attempt else instance_id
+        pbar.update(1)
+        pbar.set_postfix_str(f"{sum(eval_results.values())}/{len(eval_results)} passed, {task_label} {status}")
+    pbar.close()
+    for phase, values in latency.items():
+        if values:
+            p50, p95 = _percentiles(values)
+            print(f"Eval {phase} latency: p50 {p50:.1f}s, p95 {p95:.1f}s ({len(values)} evals)")
+    return eval_results
+
+
+def main():
+    args = parse_args()
+    raw_sample_df = load_samples(args.raw_sample_path)
+
     with open(args.patch_path, "r") as f:
         patches_to_run = json.load(f)
-    eval_results = {}
 
     valid_patches = []
     missing_instances = []
@@ -459,80 +1228,9 @@ def main():
     if missing_instances:
         print(f"Warning: {len(missing_instances)} patch instances not in raw sample data")
 
-    detected_platform = None
-    if args.use_local_docker and args.docker_platform is None:
-        try:
-            if py_platform.machine().lower() in {"arm64", "aarch64"}:
-                detected_platform = "linux/amd64"
-        except Exception:
-            pass
-
-    eval_fn = eval_with_docker if args.use_local_docker else eval_with_modal
-
-    with concurrent.futures.ThreadPoolExecutor(max_workers=args.num_workers) as executor:
-        future_to_patch = {
-            executor.submit(
-                eval_fn,
-                patch_sample.get("model_patch", patch_sample.get("patch", "")),
-                raw_sample_df.loc[patch_sample["instance_id"]],
-                args.output_dir, args.dockerhub_username, args.scripts_dir, args.dockerhub_repo,
-                prefix=patch_sample.get("prefix", ""), redo=args.redo,
-                block_network=args.block_network,
-                docker_platform=(args.docker_platform or detected_platform) if args.use_local_docker else None,
-                attempt=patch_sample.get("attempt"),
-            ): patch_sample
-            for patch_sample in valid_patches
-        }
+    eval_results = asyncio.run(_run(args, raw_sample_df, valid_patches))
 
-        pbar = tqdm(concurrent.futures.as_completed(future_to_patch), total=len(valid_patches), desc="Evals", unit="eval")
-        for future in pbar:
-            patch_sample = future_to_patch[future]
-            instance_id = patch_sample["instance_id"]
-            attempt = patch_sample.get("attempt")
-            result_key = f"{instance_id}:attempt_{attempt}" if attempt else instance_id
-            try:
-                output = future.result()
-            except Exception as e:
-                print(f"Eval exception for {instance_id} (attempt {attempt}): {e}")
-                output = None
-            if output is None:
-                eval_results[result_key] = False
-                status = "fail"
-                # Persist failure to disk so it's not retried on resume
-                if attempt is not None:
-                    task_results_dir = os.path.join(
-                        args.output_dir, instance_id, f"attempt_{attempt}", "eval_results"
-                    )
-                    os.makedirs(task_results_dir, exist_ok=True)
-                    with open(os.path.join(task_results_dir, "eval_results.json"), "w") as f:
-                        json.dump({instance_id: False}, f)
-            else:
-                if instance_id not in raw_sample_df.index:
-                    eval_results[result_key] = False
-                    status = "fail"
-                else:
-                    raw_sample = raw_sample_df.loc[instance_id]
-                    passed_tests = {x["name"] for x in output["tests"] if x["status"] == "PASSED"}
-                    f2p = set(eval(raw_sample["fail_to_pass"]))
-                    p2p = set(eval(raw_sample["pass_to_pass"]))
-                    result = (f2p | p2p) <= passed_tests
-                    eval_results[result_key] = result
-                    status = "pass" if result else "fail"
-
-                    if attempt is not None:
-                        task_results_dir = os.path.join(
-                            args.output_dir, instance_id, f"attempt_{attempt}", "eval_results"
-                        )
-                        os.makedirs(task_results_dir, exist_ok=True)
-                        with open(os.path.join(task_results_dir, "eval_results.json"), "w") as f:
-                            json.dump({instance_id: result}, f)
-
-            passed = sum(eval_results.values())
-            total = len(eval_results)
-            task_label = f"{instance_id}:{attempt}" if attempt else instance_id
-            pbar.set_postfix_str(f"{passed}/{total} passed, {task_label} {status}")
-
-    with open(os.path.join(args.output_dir, "eval_results.json"), "w") as f:
+    with open(args.results_path or os.path.join(args.output_dir, "eval_results.json"), "w") as f:
         json.dump(eval_results, f)
     print("Overall accuracy:", sum(eval_results.values()) / len(eval_results))
 
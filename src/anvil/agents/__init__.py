@@ -6,20 +6,34 @@ from .harness import (
     AGENT_CONFIGS,
     get_agent_config,
     run_agent_in_modal,
+    run_agent_with_retries,
     run_agents_batch,
     write_single_result,
     write_results,
     load_instances,
 )
+from .errors import RetryPolicy, classify_error
+from .image_cache import AgentImageCache
+from .launcher import LaunchLimiter
+from .snapshots import SnapshotCache
+from .trajectory_store import TrajectoryStore, load_trajectory
 
 __all__ = [
     "AgentConfig",
+    "AgentImageCache",
     "AgentResult",
     "AGENT_CONFIGS",
+    "LaunchLimiter",
+    "RetryPolicy",
+    "SnapshotCache",
+    "TrajectoryStore",
     "get_agent_config",
     "run_agent_in_modal",
+    "run_agent_with_retries",
     "run_agents_batch",
     "write_single_result",
     "write_results",
     "load_instances",
+    "classify_error",
+    "load_trajectory",
 ]
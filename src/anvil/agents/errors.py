@@ -0,0 +1,118 @@
+"""Rollout error classification and retry policy.
+
+Failures are sorted into three classes:
+
+- ``transient_infra``: throttling, timeouts and connection drops talking to
+  Modal or the registry. Retrying usually succeeds.
+- ``permanent_infra``: missing images, bad credentials, invalid requests.
+  Retrying cannot help.
+- ``agent``: the sandbox ran but the script exited non-zero or overran its
+  timeout. This is a result, not an infrastructure problem.
+
+Only transient failures are retried, with exponential backoff and jitter,
+within a per-run retry budget.
+"""
+
+from __future__ import annotations
+
+import random
+import re
+from dataclasses import dataclass
+from typing import Literal
+
+from .launcher import is_throttle_error
+
+ErrorClass = Literal["transient_infra", "permanent_infra", "agent"]
+
+TRANSIENT_INFRA: ErrorClass = "transient_infra"
+PERMANENT_INFRA: ErrorClass = "permanent_infra"
+AGENT_FAILURE: ErrorClass = "agent"
+
+# Exception types are checked before messages, so a connection error or timeout
+# is retried whatever its text says
+_AGENT_TYPES = ("SandboxTimeoutError", "SandboxTerminatedError")
+_TRANSIENT_TYPES = ("ConnectionError", "TimeoutError", "RemoteError", "ClientClosed")
+_PERMANENT_TYPES = ("AuthError", "NotFoundError", "InvalidError")
+# Specific registry and credential failures; permanent patterns win over transient ones
+_PERMANENT_PATTERNS = (
+    "manifest unknown",
+    "no such image",
+    "pull access denied",
+    "repository does not exist",
+    "unauthorized",
+    "authentication required",
+    "authentication failed",
+    "permission denied",
+    "unknown agent",
+)
+_TRANSIENT_PATTERNS = (
+    "timed out",
+    "timeout",
+    "deadline exceeded",
+    "connection",
+    "unavailable",
+    "temporarily",
+    "try again",
+    "internal error",
+    "internal server error",
+    "bad gateway",
+    "reset by peer",
+    "broken pipe",
+    "unexpected eof",
+)
+# Gateway errors as status fields ("status 503", "HTTP/1.1 502", "status_code=504"),
+# like launcher._STATUS_429; bare digits also appear in IDs and line numbers
+_TRANSIENT_STATUSES = (502, 503, 504)
+_STATUS_5XX = re.compile(r"\b(?:status|status_code|code|http(?:/[\d.]+)?)\W{0,3}50[234]\b")
+
+
+def classify_error(error: BaseException | str) -> ErrorClass:
+    """Classify a rollout exception (or its message) into an error class."""
+    if isinstance(error, BaseException):
+        type_name = type(error).__name__
+        if type_name in _AGENT_TYPES:
+            return AGENT_FAILURE
+        if is_throttle_error(error):
+            return TRANSIENT_INFRA
+        if type_name in _TRANSIENT_TYPES or isinstance(error, (ConnectionError, TimeoutError)):
+            return TRANSIENT_INFRA
+        if type_name in _PERMANENT_TYPES:
+            return PERMANENT_INFRA
+        if any(
+            getattr(error, attr, None) in _TRANSIENT_STATUSES
+            for attr in ("status", "status_code", "code")
+        ):
+            return TRANSIENT_INFRA
+        text = f"{type_name} {error}".lower()
+    else:
+        text = error.lower()
+
+    if any(p in text for p in _PERMANENT_PATTERNS):
+        return PERMANENT_INFRA
+    if any(p in text for p in _TRANSIENT_PATTERNS) or _STATUS_5XX.search(text):
+        return TRANSIENT_INFRA
+    return PERMANENT_INFRA
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with jitter, bounded per rollout and per run."""
+
+    max_retries: int = 3
+    base_delay: float = 5.0
+    max_delay: float = 120.0
+    budget: int = 20
+    used: int = 0
+
+    def allow(self, error_class: ErrorClass | None, tries: int) -> bool:
+        """Consume one unit of budget if a rollout that failed after ``tries`` may retry."""
+        if error_class != TRANSIENT_INFRA or tries > self.max_retries:
+            return False
+        if self.used >= self.budget:
+            return False
+        self.used += 1
+        return True
+
+    def delay(self, tries: int) -> float:
+        backoff = min(self.max_delay, self.base_delay * 2 ** (tries - 1))
+        return backoff * random.uniform(0.5, 1.5)
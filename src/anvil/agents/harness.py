@@ -11,8 +11,11 @@ This module provides a pluggable interface for running any CLI-based coding agen
 from __future__ import annotations
 
 import asyncio
+import io
 import json
 import os
+import secrets
+import tarfile
 import time
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -20,6 +23,12 @@ from typing import Literal
 
 import yaml
 
+from .errors import AGENT_FAILURE, RetryPolicy, classify_error
+from .image_cache import AgentImageCache, agent_setup_commands
+from .launcher import LaunchLimiter
+from .snapshots import SnapshotCache
+from .trajectory_store import TrajectoryStore
+
 
 @dataclass
 class AgentConfig:
@@ -31,6 +40,9 @@ class AgentConfig:
     output_format: Literal["trajectory_json", "git_only", "stdout"] = "git_only"
     timeout: int = 600
     extra_env: dict[str, str] = field(default_factory=dict)
+    cpu: float | None = None  # Cores requested for the sandbox (None = Modal default)
+    memory: int | None = None  # MiB requested for the sandbox (None = Modal default)
+    version: str | None = None  # Pinned install; agent images persist across runs only when set
 
 
 @dataclass
@@ -45,6 +57,14 @@ class AgentResult:
     exit_code: int
     duration_seconds: float
     error: str | None = None
+    streamed: bool = False  # stdout/stderr were tailed straight to log files
+    error_class: str | None = None  # See errors.classify_error
+    tries: int = 1
+    peak_memory_mb: float | None = None
+    cpu_seconds: float | None = None
+    resources: dict | None = None  # cpu/memory/timeout the sandbox was created with
+    phases: dict[str, float] = field(default_factory=dict)  # Phase name -> seconds
+    eval_output: dict | None = None  # Parsed test results when evaluated in the sandbox
 
 
 # Predefined agent configurations
@@ -67,15 +87,61 @@ def get_agent_config(agent_name: str) -> AgentConfig:
     return AGENT_CONFIGS[agent_name]
 
 
+def sandbox_resources(agent_config: AgentConfig, instance: dict) -> dict:
+    """Sandbox.create resource kwargs, with per-instance cpu/memory/timeout overrides."""
+    resources = {"timeout": int(instance.get("timeout") or agent_config.timeout)}
+    cpu = instance.get("cpu") or agent_config.cpu
+    memory = instance.get("memory") or agent_config.memory
+    if cpu:
+        resources["cpu"] = float(cpu)
+    if memory:
+        resources["memory"] = int(memory)
+    return resources
+
+
 def _sq(s: str) -> str:
     """Shell-escape a string with single quotes."""
     return "'" + (s or "").replace("'", "'\"'\"'") + "'"
 
 
-PATCH_START_MARKER = "===ANVIL_PATCH_START==="
-PATCH_END_MARKER = "===ANVIL_PATCH_END==="
-TRAJECTORY_START_MARKER = "===ANVIL_TRAJECTORY_START==="
-TRAJECTORY_END_MARKER = "===ANVIL_TRAJECTORY_END==="
+OUTPUT_DIR = "/workspace/output"
+# Extra sandbox lifetime for grading in place, matching a standalone eval sandbox
+EVAL_TIMEOUT = 60 * 60
+ARTIFACTS_ARCHIVE = "/workspace/artifacts.tar.gz"
+RESOURCE_USAGE_FILE = "resource_usage.txt"
+PHASES_FILE = "phases.txt"
+
+
+def _checkpoint(name: str) -> str:
+    """Shell line appending a wall-clock checkpoint to the phases file."""
+    return f'echo "{name} $(date +%s.%N)" >> {OUTPUT_DIR}/{PHASES_FILE}'
+
+
+def _setup_lines(
+    agent_config: AgentConfig,
+    instance: dict,
+    install_agent: bool,
+    checkpoints: bool = False,
+) -> list[str]:
+    """Per-instance setup steps that run before the agent command."""
+    before_cmd = instance.get("before_repo_set_cmd", "")
+    return [
+        *([_checkpoint("setup")] if checkpoints else []),
+        before_cmd if before_cmd else "true",
+        "cd /app",
+        *([_checkpoint("install")] if checkpoints else []),
+        *(agent_setup_commands(agent_config) if install_agent else []),
+        f"mkdir -p {OUTPUT_DIR}",
+    ]
+
+
+def _build_setup_script(
+    agent_config: AgentConfig,
+    instance: dict,
+    install_agent: bool = True,
+) -> str:
+    """Build the setup-only script used to prepare a sandbox for snapshotting."""
+    return "\n".join(["set -e", *_setup_lines(agent_config, instance, install_agent)])
 
 
 def _build_agent_script(
@@ -83,11 +149,18 @@ def _build_agent_script(
     instance: dict,
     model: str,
     provider_env_var: str,
+    install_agent: bool = True,
+    include_setup: bool = True,
 ) -> str:
-    """Build the bash script to run inside the Modal sandbox."""
+    """Build the bash script to run inside the Modal sandbox.
+
+    With ``install_agent=False`` the agent is assumed to be baked into the image
+    (see ``AgentImageCache``) and the ensurepip/pip/install steps are skipped.
+    With ``include_setup=False`` the sandbox is assumed to start from a snapshot
+    taken after ``_build_setup_script`` ran (see ``SnapshotCache``).
+    """
     task = instance.get("problem_statement", "")
-    before_cmd = instance.get("before_repo_set_cmd", "")
-    output_dir = "/workspace/output"
+    output_dir = OUTPUT_DIR
 
     run_cmd = agent_config.run_cmd.format(
         model=_sq(model),
@@ -101,13 +174,15 @@ def _build_agent_script(
         f"export MSWEA_MODEL_NAME={_sq(model)}",
         f"export MSWEA_MODEL_API_KEY={provider_env_var}",
         "export MSWEA_COST_TRACKING=ignore_errors",
-        before_cmd if before_cmd else "true",
-        "cd /app",
-        "python3 -m ensurepip 2>/dev/null || true",
-        "pip install --upgrade pip -q --break-system-packages 2>/dev/null || true",
-        f"mkdir -p {output_dir}",
-        agent_config.install_cmd,
+        f"mkdir -p {output_dir} && : > {output_dir}/{PHASES_FILE}",
+        *(
+            _setup_lines(agent_config, instance, install_agent, checkpoints=True)
+            if include_setup
+            else ["cd /app"]
+        ),
+        _checkpoint("agent"),
         f"{run_cmd} || true",
+        _checkpoint("capture"),
         """cat > .gitignore << 'GITIGNORE_EOF'
 # === Build outputs ===
 build/
@@ -170,29 +245,148 @@ afterquery/
 .gitignore
 GITIGNORE_EOF
 """,
-        f'echo "{PATCH_START_MARKER}"',
         "git add -A && git reset --quiet HEAD -- afterquery/ .gitignore package-lock.json pnpm-lock.yaml yarn.lock bun.lockb 2>/dev/null || true",
         # Unstage binary files that agents may have compiled (e.g. Go binaries without extensions)
         r"""git diff --cached --numstat | awk '$1 == "-" && $2 == "-" {print $3}' | xargs -r git reset --quiet HEAD -- 2>/dev/null || true""",
-        "git diff --cached --binary || true",
-        f'echo "{PATCH_END_MARKER}"',
+        f"git diff --cached --binary > {output_dir}/patch.diff || true",
         f"echo '=== Files in {output_dir}:' && ls -la {output_dir}/ 2>/dev/null || echo '(none)'",
-        f'echo "{TRAJECTORY_START_MARKER}"',
-        f"cat {output_dir}/trajectory.traj.json 2>/dev/null || echo '{{}}'",
-        f'echo "{TRAJECTORY_END_MARKER}"',
+        # Best-effort peak usage from cgroup v2 (or v1) counters for `anvil recommend-resources`
+        f"{{ echo \"memory_peak_bytes $(cat /sys/fs/cgroup/memory.peak 2>/dev/null || cat /sys/fs/cgroup/memory/memory.max_usage_in_bytes 2>/dev/null)\"; "
+        f"echo \"cpu_usage_usec $(awk '/^usage_usec/ {{print $2}}' /sys/fs/cgroup/cpu.stat 2>/dev/null)\"; }} > {output_dir}/{RESOURCE_USAGE_FILE} || true",
+        _checkpoint("done"),
+        # Artifacts are pulled back in one transfer; stdout stays a plain log
+        f"tar -czf {ARTIFACTS_ARCHIVE} -C {output_dir} .",
     ]
 
     return "\n".join(lines)
 
 
-def _extract_between_markers(text: str, start: str, end: str) -> str:
-    """Extract text between markers. Ensures trailing newline for git patches."""
+def _eval_script(eval_dir: str) -> str:
+    """Reset to base_commit, apply the captured patch and run the tests in place."""
+    return "\n".join([
+        f"chmod 700 {eval_dir}",
+        f"bash {eval_dir}/entryscript.sh || true",
+    ])
+
+
+async def _write_files(
+    sandbox: "modal.Sandbox", files: dict[str, str | bytes], directory: str = "/workspace"
+) -> None:
+    """Write files under ``directory`` in the sandbox."""
+    process = await sandbox.exec.aio("mkdir", "-p", directory)
+    await process.wait.aio()
+    for name, content in files.items():
+        mode = "wb" if isinstance(content, bytes) else "w"
+        f = await sandbox.open.aio(f"{directory}/{name}", mode)
+        try:
+            await f.write.aio(content)
+        finally:
+            await f.close.aio()
+
+
+async def _evaluate_in_sandbox(
+    sandbox: "modal.Sandbox", eval_files: dict[str, str], patch: bytes
+) -> tuple[dict | None, str, str]:
+    """Grade ``patch`` with the evaluator files in a directory the agent never saw.
+
+    Runs after the agent process has exited: the files are written to a fresh,
+    randomly named directory and the entryscript's ``/workspace`` paths are
+    pointed at it, so the agent can neither read nor edit what grades it.
+    Returns the parsed ``output.json`` (or None) and the eval's stdout/stderr.
+    """
+    eval_dir = f"/opt/anvil-eval-{secrets.token_hex(8)}"
+    files = {
+        name: content.replace("/workspace/", f"{eval_dir}/")
+        for name, content in eval_files.items()
+    }
+    await _write_files(sandbox, {**files, "patch.diff": patch}, eval_dir)
+
+    process = await sandbox.exec.aio("bash", "-lc", _eval_script(eval_dir))
+    stdout, stderr = await asyncio.gather(
+        process.stdout.read.aio(), process.stderr.read.aio()
+    )
+    await process.wait.aio()
+
+    try:
+        f = await sandbox.open.aio(f"{eval_dir}/output.json", "r")
+        try:
+            return json.loads(await f.read.aio()), stdout, stderr
+        finally:
+            await f.close.aio()
+    except Exception:
+        # The tests never produced a parseable report
+        return None, stdout, stderr
+
+
+async def _fetch_artifacts(sandbox: "modal.Sandbox") -> dict[str, bytes]:
+    """Read the artifacts tarball from the sandbox and return its files by name."""
     try:
-        s = text.index(start) + len(start)
-        result = text[s : text.index(end, s)].strip()
-        return result + "\n" if result and not result.endswith("\n") else result
-    except ValueError:
-        return ""
+        f = await sandbox.open.aio(ARTIFACTS_ARCHIVE, "rb")
+        try:
+            data = await f.read.aio()
+        finally:
+            await f.close.aio()
+    except Exception:
+        # The script never reached the archive step
+        return {}
+
+    artifacts = {}
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        for member in tar.getmembers():
+            if member.isfile():
+                artifacts[member.name.removeprefix("./")] = tar.extractfile(member).read()
+    return artifacts
+
+
+def _parse_resource_usage(data: bytes) -> tuple[float | None, float | None]:
+    """Parse resource_usage.txt into (peak_memory_mb, cpu_seconds)."""
+    values = {}
+    for line in data.decode(errors="replace").splitlines():
+        name, _, value = line.partition(" ")
+        try:
+            values[name] = float(value)
+        except ValueError:
+            pass
+    mem = values.get("memory_peak_bytes")
+    cpu = values.get("cpu_usage_usec")
+    return (
+        mem / (1024 * 1024) if mem else None,
+        cpu / 1_000_000 if cpu else None,
+    )
+
+
+def _parse_phases(data: bytes) -> dict[str, float]:
+    """Turn script checkpoints into per-phase durations, keyed ``script.<phase>``."""
+    marks = []
+    for line in data.decode(errors="replace").splitlines():
+        name, _, ts = line.partition(" ")
+        try:
+            marks.append((name, float(ts)))
+        except ValueError:
+            pass
+    return {
+        f"script.{name}": round(next_ts - ts, 3)
+        for (name, ts), (_, next_ts) in zip(marks, marks[1:])
+    }
+
+
+class _PhaseTimer:
+    """Record host-side phase durations as consecutive wall-clock intervals."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self._last = time.time()
+
+    def mark(self, name: str) -> None:
+        now = time.time()
+        self.phases[name] = round(now - self._last, 3)
+        self._last = now
+
+
+async def _pump_stream(stream, sink) -> None:
+    """Feed chunks from a Modal stream reader into ``sink`` as they arrive."""
+    async for chunk in stream:
+        sink(chunk)
 
 
 async def run_agent_in_modal(
@@ -203,18 +397,65 @@ async def run_agent_in_modal(
     app: "modal.App",
     registry_secret: "modal.Secret | None" = None,
     on_running: callable = None,
+    image_cache: AgentImageCache | None = None,
+    log_dir: Path | None = None,
+    launcher: LaunchLimiter | None = None,
+    snapshots: SnapshotCache | None = None,
+    eval_files: dict[str, str] | None = None,
 ) -> AgentResult:
-    """Execute an agent in a Modal sandbox for a single instance."""
+    """Execute an agent in a Modal sandbox for a single instance.
+
+    When ``image_cache`` is given the sandbox starts from a pre-built image with
+    the agent already installed instead of installing it in every sandbox.
+
+    When ``log_dir`` is given, stdout/stderr are streamed into ``stdout.log`` /
+    ``stderr.log`` there as they arrive and the returned result carries empty
+    ``stdout``/``stderr``.
+
+    When ``launcher`` is given, ``Sandbox.create`` is paced and retried by it.
+
+    When ``snapshots`` is given, the sandbox starts from the instance's shared
+    post-setup snapshot and only the agent command and capture steps run.
+
+    When ``eval_files`` is given (``run_script.sh``, ``parser.py`` and the
+    evaluator's ``entryscript.sh``), the patch is also evaluated in the same
+    sandbox once the agent has exited, from a directory the agent never saw
+    (see ``_evaluate_in_sandbox``), and the parsed test output is returned in
+    ``eval_output``; grading it against the task's tests is left to the caller.
+    The sandbox then lives ``EVAL_TIMEOUT`` longer than the agent's timeout,
+    which still bounds the agent script. If grading fails, ``eval_output`` is
+    None and the rollout result is kept as is.
+
+    The patch and trajectory are written under ``/workspace/output`` by the
+    script and retrieved as a single tarball, independent of stdout.
+    """
     import modal
 
     instance_id = instance.get("instance_id", "unknown")
     image_name = instance.get("image_name", "")
 
     start_time = time.time()
+    timer = _PhaseTimer()
+    # Set once the log files exist; earlier failures keep their logs in the result
+    streamed = False
 
     try:
-        img = modal.Image.from_registry(image_name, secret=registry_secret)
-        script = _build_agent_script(agent_config, instance, model, provider_env_var)
+        snapshot = None
+        if snapshots is not None:
+            snapshot = await snapshots.get(agent_config, instance)
+
+        if snapshot is not None:
+            img = snapshot
+        elif image_cache is not None:
+            img = await image_cache.get(image_name, agent_config, app, registry_secret)
+        else:
+            img = modal.Image.from_registry(image_name, secret=registry_secret)
+        script = _build_agent_script(
+            agent_config, instance, model, provider_env_var,
+            install_agent=image_cache is None,
+            include_setup=snapshot is None,
+        )
+        timer.mark("image")
 
         env_secrets = []
         env_var_name = provider_env_var.lstrip("$")
@@ -225,59 +466,124 @@ async def run_agent_in_modal(
         if agent_config.extra_env:
             env_secrets.append(modal.Secret.from_dict(agent_config.extra_env))
 
-        sandbox = await modal.Sandbox.create.aio(
-            "bash", "-lc", script,
-            image=img,
-            timeout=agent_config.timeout,
-            app=app,
-            secrets=env_secrets if env_secrets else None,
-        )
+        # The sandbox idles while the script runs via exec, so artifacts can be
+        # read back through the filesystem API after the script exits.
+        resources = sandbox_resources(agent_config, instance)
+        agent_timeout = resources["timeout"]
+        if eval_files is not None:
+            # Grading gets its own time; the agent stays bounded by its exec timeout
+            resources = {**resources, "timeout": agent_timeout + EVAL_TIMEOUT}
+
+        def create_sandbox():
+            return modal.Sandbox.create.aio(
+                image=img,
+                app=app,
+                secrets=env_secrets if env_secrets else None,
+                **resources,
+            )
+
+        if launcher is not None:
+            sandbox = await launcher.launch(create_sandbox)
+        else:
+            sandbox = await create_sandbox()
+        timer.mark("sandbox_create")
         if on_running:
             on_running(instance_id)
-        await sandbox.wait.aio()
-        raw_stdout = await sandbox.stdout.read.aio()
-        stderr = await sandbox.stderr.read.aio()
-        exit_code = sandbox.returncode
-        await sandbox.terminate.aio()
-
-        patch = _extract_between_markers(
-            raw_stdout, PATCH_START_MARKER, PATCH_END_MARKER
-        )
-        traj_str = _extract_between_markers(
-            raw_stdout, TRAJECTORY_START_MARKER, TRAJECTORY_END_MARKER
+
+        eval_output = None
+        try:
+            process = await sandbox.exec.aio("bash", "-lc", script, timeout=agent_timeout)
+            if log_dir is not None:
+                log_dir.mkdir(parents=True, exist_ok=True)
+                with (log_dir / "stdout.log").open("w") as out_f, (
+                    log_dir / "stderr.log"
+                ).open("w") as err_f:
+                    streamed = True
+                    await asyncio.gather(
+                        _pump_stream(process.stdout, out_f.write),
+                        _pump_stream(process.stderr, err_f.write),
+                    )
+                stdout, stderr = "", ""
+            else:
+                stdout, stderr = await asyncio.gather(
+                    process.stdout.read.aio(), process.stderr.read.aio()
+                )
+            exit_code = await process.wait.aio()
+            timer.mark("script")
+            artifacts = await _fetch_artifacts(sandbox)
+            timer.mark("artifacts")
+
+            # Replacing undecodable bytes would hand the evaluator a corrupted diff
+            # that no longer applies, so such a patch fails the attempt instead
+            patch_error = None
+            patch_bytes = artifacts.get("patch.diff", b"")
+            try:
+                patch = patch_bytes.decode("utf-8")
+            except UnicodeDecodeError as e:
+                patch = ""
+                patch_error = f"patch.diff is not valid UTF-8, attempt discarded: {e}"
+                if streamed:
+                    with (log_dir / "stderr.log").open("a") as err_f:
+                        err_f.write(f"\n[anvil] {patch_error}\n")
+                else:
+                    stderr += f"\n[anvil] {patch_error}\n"
+
+            # Graded only once the agent has exited, from the bytes it captured
+            if eval_files is not None and patch_error is None:
+                try:
+                    eval_output, eval_stdout, eval_stderr = await _evaluate_in_sandbox(
+                        sandbox, eval_files, patch_bytes
+                    )
+                except Exception as e:
+                    # Keep the rollout; the patch goes to the regular eval queue
+                    eval_output, eval_stdout = None, ""
+                    eval_stderr = f"\n[anvil] in-sandbox eval failed, queued for a separate eval: {e}\n"
+                if streamed:
+                    with (log_dir / "stdout.log").open("a") as out_f:
+                        out_f.write(eval_stdout)
+                    with (log_dir / "stderr.log").open("a") as err_f:
+                        err_f.write(eval_stderr)
+                else:
+                    stdout += eval_stdout
+                    stderr += eval_stderr
+                timer.mark("eval")
+        finally:
+            await sandbox.terminate.aio()
+            timer.mark("teardown")
+
+        traj_bytes = artifacts.get("trajectory.traj.json", b"")
+        peak_memory_mb, cpu_seconds = _parse_resource_usage(
+            artifacts.get(RESOURCE_USAGE_FILE, b"")
         )
+        phases = {**timer.phases, **_parse_phases(artifacts.get(PHASES_FILE, b""))}
 
         trajectory = None
-        if agent_config.output_format == "trajectory_json" and traj_str:
+        if agent_config.output_format == "trajectory_json" and traj_bytes:
             try:
-                parsed = json.loads(traj_str)
+                parsed = json.loads(traj_bytes)
                 if parsed and parsed != {}:
                     trajectory = parsed
             except json.JSONDecodeError:
                 pass
 
-        stdout = raw_stdout
-        for start_m, end_m in [
-            (PATCH_START_MARKER, PATCH_END_MARKER),
-            (TRAJECTORY_START_MARKER, TRAJECTORY_END_MARKER),
-        ]:
-            try:
-                s_idx = stdout.index(start_m)
-                e_idx = stdout.index(end_m, s_idx) + len(end_m)
-                stdout = stdout[:s_idx] + stdout[e_idx:]
-            except ValueError:
-                pass
-
         duration = time.time() - start_time
 
         return AgentResult(
             instance_id=instance_id,
             patch=patch,
-            stdout=stdout.strip(),
+            stdout=stdout,
             stderr=stderr,
             trajectory=trajectory,
             exit_code=exit_code if exit_code is not None else -1,
             duration_seconds=duration,
+            error=patch_error,
+            streamed=streamed,
+            error_class=AGENT_FAILURE if exit_code != 0 or patch_error else None,
+            peak_memory_mb=peak_memory_mb,
+            cpu_seconds=cpu_seconds,
+            resources=sandbox_resources(agent_config, instance),
+            phases=phases,
+            eval_output=eval_output,
         )
 
     except Exception as e:
@@ -291,9 +597,32 @@ async def run_agent_in_modal(
             exit_code=-1,
             duration_seconds=duration,
             error=str(e),
+            streamed=streamed,
+            error_class=classify_error(e),
+            phases=timer.phases,
         )
 
 
+async def run_agent_with_retries(
+    *args,
+    retry: RetryPolicy | None = None,
+    **kwargs,
+) -> AgentResult:
+    """Run ``run_agent_in_modal``, retrying transient infrastructure failures.
+
+    Arguments are forwarded to ``run_agent_in_modal``. The returned result
+    records how many tries it took in ``tries``.
+    """
+    tries = 0
+    while True:
+        result = await run_agent_in_modal(*args, **kwargs)
+        tries += 1
+        result.tries = tries
+        if retry is None or not retry.allow(result.error_class, tries):
+            return result
+        await asyncio.sleep(retry.delay(tries))
+
+
 async def run_agents_batch(
     agent_config: AgentConfig,
     instances: list[dict],
@@ -302,8 +631,15 @@ async def run_agents_batch(
     on_progress: callable = None,
     on_result: callable = None,
     max_wait_minutes: int = 20,
+    launcher: LaunchLimiter | None = None,
+    retry: RetryPolicy | None = None,
 ) -> list[AgentResult]:
-    """Run agents on all instances."""
+    """Run agents on all instances.
+
+    Sandbox launches are paced by ``launcher`` (a fresh ``LaunchLimiter`` if not
+    given); pass one in to read its stats afterwards. Transient infrastructure
+    failures are retried under ``retry`` (a default ``RetryPolicy`` if not given).
+    """
     import modal
 
     os.environ.setdefault("MODAL_MAX_THROTTLE_WAIT", str(max_wait_minutes * 60))
@@ -326,6 +662,10 @@ async def run_agents_batch(
             }
         )
 
+    image_cache = AgentImageCache()
+    launcher = launcher or LaunchLimiter()
+    retry = retry or RetryPolicy()
+
     async def run_one(instance: dict) -> AgentResult:
         instance_id = instance.get("instance_id", "unknown")
         if on_progress:
@@ -335,7 +675,7 @@ async def run_agents_batch(
             if on_progress:
                 on_progress(iid, "running")
 
-        result = await run_agent_in_modal(
+        result = await run_agent_with_retries(
             agent_config=agent_config,
             instance=instance,
             model=model,
@@ -343,6 +683,9 @@ async def run_agents_batch(
             app=app,
             registry_secret=registry_secret,
             on_running=on_running,
+            image_cache=image_cache,
+            launcher=launcher,
+            retry=retry,
         )
 
         if on_progress:
@@ -357,11 +700,8 @@ async def run_agents_batch(
 
         return result
 
-    tasks = []
-    for inst in instances:
-        tasks.append(asyncio.create_task(run_one(inst)))
-        await asyncio.sleep(1.0)
-
+    # Launch pacing is handled by the shared LaunchLimiter rather than a fixed stagger
+    tasks = [asyncio.create_task(run_one(inst)) for inst in instances]
     return await asyncio.gather(*tasks)
 
 
@@ -369,17 +709,27 @@ def write_single_result(
     result: AgentResult,
     output_dir: Path,
     eval_id: str,
+    trajectory_store: TrajectoryStore | None = None,
+    attempt: int = 1,
 ) -> None:
-    """Write a single agent result to disk."""
+    """Write a single agent result to disk.
+
+    With a ``trajectory_store`` the trajectory is appended to the run's
+    compressed store instead of a per-attempt ``trajectory.json``.
+    """
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    (output_dir / "stdout.log").write_text(result.stdout)
-    (output_dir / "stderr.log").write_text(result.stderr)
+    if not result.streamed:
+        (output_dir / "stdout.log").write_text(result.stdout)
+        (output_dir / "stderr.log").write_text(result.stderr)
 
     if result.trajectory:
-        (output_dir / "trajectory.json").write_text(
-            json.dumps(result.trajectory, indent=2)
-        )
+        if trajectory_store is not None:
+            trajectory_store.put(result.instance_id, attempt, result.trajectory)
+        else:
+            (output_dir / "trajectory.json").write_text(
+                json.dumps(result.trajectory, indent=2)
+            )
 
     pred_file = output_dir / f"{result.instance_id}.pred"
     pred_data = {
@@ -394,6 +744,12 @@ def write_single_result(
         "exit_code": result.exit_code,
         "duration_seconds": result.duration_seconds,
         "error": result.error,
+        "error_class": result.error_class,
+        "tries": result.tries,
+        "resources": result.resources,
+        "peak_memory_mb": result.peak_memory_mb,
+        "cpu_seconds": result.cpu_seconds,
+        "phases": result.phases,
     }
     (output_dir / "metadata.json").write_text(json.dumps(meta, indent=2))
 
@@ -0,0 +1,162 @@
+"""Derived-image cache for agent sandboxes.
+
+Installing the agent (ensurepip, pip upgrade, ``AgentConfig.install_cmd``) is
+identical for every attempt on a given task image, so it is baked into a
+derived Modal image once and reused. Images are keyed by a content hash of
+(task image digest, agent name, agent version, install commands); built image
+IDs are persisted under ``cache_dir()`` so later runs skip the build entirely.
+
+Only images that are fully pinned are persisted: the task image's registry
+digest must resolve and the agent must have a ``version``. Otherwise the image
+is built once per process with ``force_build``, so a re-pushed tag or a new
+agent release is never served from a stale build.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Awaitable, Callable
+
+from ..config import cache_dir
+
+if TYPE_CHECKING:
+    import modal
+
+    from .harness import AgentConfig
+
+
+def agent_setup_commands(agent_config: AgentConfig) -> list[str]:
+    """Commands that install the agent into a task image."""
+    return [
+        "python3 -m ensurepip 2>/dev/null || true",
+        "pip install --upgrade pip -q --break-system-packages 2>/dev/null || true",
+        agent_config.install_cmd,
+    ]
+
+
+def agent_image_key(image_digest: str, agent_config: AgentConfig) -> str:
+    """Content hash identifying the agent-installed layer for a task image digest."""
+    payload = json.dumps(
+        [
+            image_digest,
+            agent_config.name,
+            agent_config.version,
+            agent_setup_commands(agent_config),
+        ]
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class AgentImageCache:
+    """Build each agent-installed image once and share it across attempts and runs."""
+
+    def __init__(
+        self,
+        index_path: Path | None = None,
+        resolve_digest: Callable[[str], Awaitable[str | None]] | None = None,
+    ):
+        self.index_path = index_path or cache_dir() / "agent_images.json"
+        # Share an EvalSession's digests when given; otherwise resolve them here
+        self.resolve_digest = resolve_digest or self._registry_digest
+        self._index: dict[str, dict] = self._load_index()
+        self._digests: dict[str, str | None] = {}
+        self._images: dict[str, modal.Image] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._file_lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def _load_index(self) -> dict[str, dict]:
+        try:
+            return json.loads(self.index_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            return {}
+
+    def _save_index(self) -> None:
+        with self._file_lock:
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(self._index, indent=2))
+            tmp.replace(self.index_path)
+
+    async def _registry_digest(self, image_name: str) -> str | None:
+        from .._vendor.swe_bench_pro.swe_bench_pro_eval import (
+            registry_credentials_from_env,
+            registry_digest,
+        )
+
+        if image_name not in self._digests:
+            self._digests[image_name] = await asyncio.to_thread(
+                registry_digest, image_name, registry_credentials_from_env()
+            )
+        return self._digests[image_name]
+
+    async def get(
+        self,
+        image_name: str,
+        agent_config: AgentConfig,
+        app: modal.App,
+        registry_secret: modal.Secret | None = None,
+    ) -> modal.Image:
+        """Return the agent-installed image for a task image, building it at most once."""
+        import modal
+
+        from .._vendor.swe_bench_pro.swe_bench_pro_eval import pinned_image_ref
+
+        digest = await self.resolve_digest(image_name)
+        persist = digest is not None and agent_config.version is not None
+        key = agent_image_key(digest or image_name, agent_config)
+        if key in self._images:
+            self.hits += 1
+            return self._images[key]
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key in self._images:
+                self.hits += 1
+                return self._images[key]
+
+            entry = self._index.get(key) if persist else None
+            if entry:
+                try:
+                    img = modal.Image.from_id(entry["image_id"])
+                    await img.hydrate.aio()
+                    self._images[key] = img
+                    self.hits += 1
+                    return img
+                except Exception:
+                    # Image was garbage-collected on Modal's side; rebuild below
+                    self._index.pop(key, None)
+
+            if digest is not None:
+                base = modal.Image.from_registry(
+                    pinned_image_ref(image_name, digest), secret=registry_secret
+                )
+            else:
+                base = modal.Image.from_registry(
+                    image_name, secret=registry_secret, force_build=True
+                )
+            # An unpinned install must not come back from Modal's layer cache either
+            img = base.run_commands(
+                *agent_setup_commands(agent_config), force_build=not persist
+            )
+            await img.build.aio(app)
+            self.builds += 1
+            self._images[key] = img
+            if persist:
+                self._index[key] = {
+                    "image_id": img.object_id,
+                    "image_name": image_name,
+                    "digest": digest,
+                    "agent": agent_config.name,
+                    "version": agent_config.version,
+                    "created_at": time.time(),
+                }
+                self._save_index()
+            return img
@@ -0,0 +1,145 @@
+"""Adaptive launch rate limiting for Modal sandboxes.
+
+A token bucket paces ``Sandbox.create`` calls and adapts its rate with AIMD:
+each successful launch nudges the rate up additively, while throttling or
+create errors cut it multiplicatively. Throttled launches are retried with
+exponential backoff.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Rate-limit exception types (Modal's and common HTTP client ones), by name
+_THROTTLE_TYPES = ("ResourceExhaustedError", "RateLimitError", "TooManyRequests")
+_THROTTLE_PATTERNS = (
+    "rate limit",
+    "ratelimit",
+    "throttl",
+    "too many requests",
+    "resource exhausted",
+    "resourceexhausted",
+)
+# A 429 status field in a message ("status 429", "HTTP/1.1 429", "status_code=429"),
+# not any occurrence of the digits, which also appear in IDs, ports and line numbers
+_STATUS_429 = re.compile(r"\b(?:status|status_code|code|http(?:/[\d.]+)?)\W{0,3}429\b")
+
+
+def is_throttle_error(exc: BaseException) -> bool:
+    """Return True if an exception looks like provider-side rate limiting."""
+    if type(exc).__name__ in _THROTTLE_TYPES:
+        return True
+    for attr in ("status", "status_code", "code"):
+        value = getattr(exc, attr, None)
+        if value == 429 or str(value).upper() == "RESOURCE_EXHAUSTED":
+            return True
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(p in text for p in _THROTTLE_PATTERNS) or bool(_STATUS_429.search(text))
+
+
+@dataclass
+class LaunchStats:
+    launches: int = 0
+    failures: int = 0
+    throttle_events: int = 0
+    throttled_seconds: float = 0.0
+    first_launch: float | None = None
+    last_launch: float | None = None
+
+    @property
+    def achieved_rate(self) -> float:
+        """Launches per second between the first and last launch."""
+        if not self.first_launch or not self.last_launch or self.launches < 2:
+            return 0.0
+        span = self.last_launch - self.first_launch
+        return (self.launches - 1) / span if span > 0 else 0.0
+
+
+class LaunchLimiter:
+    """Token-bucket launcher with AIMD backoff, shared by all sandbox launches."""
+
+    def __init__(
+        self,
+        rate: float = 2.0,
+        burst: int = 4,
+        min_rate: float = 0.1,
+        max_rate: float = 20.0,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+        max_retries: int = 6,
+        max_backoff: float = 60.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.stats = LaunchStats()
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a launch token is available."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_success(self) -> None:
+        # Roughly +increase launches/s for every second of successful launches
+        self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0))
+
+    def on_failure(self) -> None:
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self._tokens = min(self._tokens, 0.0)
+
+    async def launch(self, create: Callable[[], Awaitable[T]]) -> T:
+        """Run ``create`` under the rate limit, retrying throttled attempts."""
+        retry = 0
+        while True:
+            await self.acquire()
+            try:
+                result = await create()
+            except Exception as e:
+                self.stats.failures += 1
+                self.on_failure()
+                if not is_throttle_error(e) or retry >= self.max_retries:
+                    raise
+                self.stats.throttle_events += 1
+                backoff = min(self.max_backoff, 2.0**retry)
+                self.stats.throttled_seconds += backoff
+                await asyncio.sleep(backoff)
+                retry += 1
+                continue
+
+            now = time.time()
+            self.stats.launches += 1
+            self.stats.first_launch = self.stats.first_launch or now
+            self.stats.last_launch = now
+            self.on_success()
+            return result
+
+    def summary(self) -> str:
+        s = self.stats
+        return (
+            f"{s.launches} launched at {s.achieved_rate:.2f}/s "
+            f"(final rate {self.rate:.2f}/s), {s.throttle_events} throttled, "
+            f"{s.throttled_seconds:.0f}s in backoff"
+        )
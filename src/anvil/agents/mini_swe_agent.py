@@ -20,6 +20,8 @@ from .harness import (
     write_results,
     write_single_result,
 )
+from .trajectory_store import TrajectoryStore
+from .launcher import LaunchLimiter
 
 
 def _load_default_minisweagent_config(model: str) -> str:
@@ -49,7 +51,7 @@ def run_dataset_batch(
 ) -> int:
     """Run mini-swe-agent on all instances in a dataset using Modal.
 
-    Modal handles concurrency and rate limiting internally via MODAL_MAX_THROTTLE_WAIT.
+    Sandbox launches are paced by an adaptive token-bucket limiter.
 
     Args:
         model: Model identifier (e.g., "openai/gpt-4")
@@ -84,13 +86,16 @@ def run_dataset_batch(
         typer.echo(f"  [{status}] {instance_id}")
 
     # Write each result immediately as it completes (task-first structure)
+    trajectory_store = TrajectoryStore(output_dir)
+
     def on_result(result) -> None:
         result_dir = output_dir / result.instance_id / "attempt_1"
-        write_single_result(result, result_dir, eval_id)
+        write_single_result(result, result_dir, eval_id, trajectory_store=trajectory_store)
 
     typer.echo(f"Running {len(instances)} instances...")
 
-    # Run agents in parallel on Modal - Modal handles concurrency/throttling internally
+    # Run agents in parallel on Modal - launches are paced by an adaptive limiter
+    launcher = LaunchLimiter()
     with modal.enable_output():
         results = asyncio.run(
             run_agents_batch(
@@ -100,8 +105,10 @@ def run_dataset_batch(
                 provider_env_var=provider_env_var,
                 on_progress=on_progress,
                 on_result=on_result,
+                launcher=launcher,
             )
         )
+    typer.echo(f"Sandbox launches: {launcher.summary()}")
 
     # Write aggregated patches JSON (individual results already written by on_result)
     write_results(results, output_dir, eval_id)
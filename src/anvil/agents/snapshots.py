@@ -0,0 +1,184 @@
+"""Filesystem-snapshot forking for multi-attempt rollouts.
+
+With ``--n-attempts k`` every attempt would otherwise pull the image, run
+``before_repo_set_cmd``, install the agent and set up ``/app`` on its own. A
+``SnapshotCache`` prepares one sandbox per instance up to the point just before
+the agent command, snapshots its filesystem, and hands the snapshot image to
+all k attempts.
+
+``docker_snapshot`` is a local stand-in built on ``docker commit`` for checking
+the setup phase without Modal; ``anvil snapshot-setup`` runs it for one task.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import TYPE_CHECKING
+
+import typer
+
+from .image_cache import AgentImageCache
+from .launcher import LaunchLimiter
+
+if TYPE_CHECKING:
+    import modal
+
+    from .harness import AgentConfig
+
+
+class SnapshotCache:
+    """Prepare each instance once and share its filesystem snapshot across attempts."""
+
+    def __init__(
+        self,
+        app: modal.App,
+        registry_secret: modal.Secret | None = None,
+        image_cache: AgentImageCache | None = None,
+        launcher: LaunchLimiter | None = None,
+    ):
+        self.app = app
+        self.registry_secret = registry_secret
+        self.image_cache = image_cache
+        self.launcher = launcher
+        self._snapshots: dict[str, modal.Image | None] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self.prepared = 0
+        self.reused = 0
+        self.failed = 0
+
+    @staticmethod
+    def _key(agent_config: AgentConfig, instance: dict) -> str:
+        # Runs of several models in one session may also differ in agent
+        return f"{agent_config.name}:{instance.get('instance_id', 'unknown')}"
+
+    def preparing(self, agent_config: AgentConfig, instance: dict) -> bool:
+        """True while another attempt is preparing this instance's snapshot."""
+        key = self._key(agent_config, instance)
+        lock = self._locks.get(key)
+        return key not in self._snapshots and lock is not None and lock.locked()
+
+    async def wait(self, agent_config: AgentConfig, instance: dict) -> None:
+        """Wait until an in-flight preparation of this instance's snapshot ends."""
+        lock = self._locks.get(self._key(agent_config, instance))
+        if lock is not None:
+            async with lock:
+                pass
+
+    async def get(self, agent_config: AgentConfig, instance: dict) -> modal.Image | None:
+        """Return the snapshot image for an instance, or None if preparation failed.
+
+        A failed preparation is remembered so attempts fall back to the full
+        script instead of retrying the setup k times.
+        """
+        key = self._key(agent_config, instance)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key in self._snapshots:
+                self.reused += 1
+                return self._snapshots[key]
+            try:
+                snapshot = await self._prepare(agent_config, instance)
+                self.prepared += 1
+            except Exception:
+                snapshot = None
+                self.failed += 1
+            self._snapshots[key] = snapshot
+            return snapshot
+
+    async def _prepare(self, agent_config: AgentConfig, instance: dict) -> modal.Image:
+        import modal
+
+        from .harness import _build_setup_script, sandbox_resources
+
+        image_name = instance.get("image_name", "")
+        if self.image_cache is not None:
+            img = await self.image_cache.get(
+                image_name, agent_config, self.app, self.registry_secret
+            )
+        else:
+            img = modal.Image.from_registry(image_name, secret=self.registry_secret)
+        script = _build_setup_script(
+            agent_config, instance, install_agent=self.image_cache is None
+        )
+
+        def create_sandbox():
+            return modal.Sandbox.create.aio(
+                image=img, app=self.app, **sandbox_resources(agent_config, instance)
+            )
+
+        if self.launcher is not None:
+            sandbox = await self.launcher.launch(create_sandbox)
+        else:
+            sandbox = await create_sandbox()
+
+        try:
+            process = await sandbox.exec.aio("bash", "-lc", script)
+            stderr = await process.stderr.read.aio()
+            exit_code = await process.wait.aio()
+            if exit_code != 0:
+                raise RuntimeError(
+                    f"setup exited with code {exit_code}: {stderr[-500:]}"
+                )
+            return await sandbox.snapshot_filesystem.aio()
+        finally:
+            await sandbox.terminate.aio()
+
+
+def docker_snapshot(
+    agent_config: AgentConfig,
+    instance: dict,
+    repository: str = "anvil-snapshot",
+) -> str:
+    """Run the setup phase in a local container and ``docker commit`` the result.
+
+    Returns the committed image tag. Intended for testing setup scripts locally.
+    """
+    import docker
+
+    from .harness import _build_setup_script
+
+    script = _build_setup_script(agent_config, instance)
+    tag = hashlib.sha256(
+        f"{instance.get('image_name', '')}\n{script}".encode()
+    ).hexdigest()[:16]
+
+    client = docker.from_env()
+    container = client.containers.run(
+        instance.get("image_name", ""),
+        ["-lc", script],
+        entrypoint="/bin/bash",
+        detach=True,
+    )
+    try:
+        result = container.wait()
+        status_code = result.get("StatusCode", 1) if isinstance(result, dict) else 1
+        if status_code != 0:
+            logs = container.logs(stderr=True, stdout=False).decode(errors="replace")
+            raise RuntimeError(f"setup exited with code {status_code}: {logs[-500:]}")
+        container.commit(repository=repository, tag=tag)
+    finally:
+        container.remove(force=True)
+    return f"{repository}:{tag}"
+
+
+def snapshot_setup(
+    dataset_id: str = typer.Option(..., "--dataset", "-d", help="Dataset ID or path"),
+    instance_id: str = typer.Option(..., "--instance", "-i", help="Task to set up"),
+    agent: str = typer.Option("mini-swe-agent", "--agent", help="Agent to install"),
+) -> None:
+    """Run a task's setup phase in local docker and commit it as an image."""
+    from .harness import get_agent_config, load_instances
+
+    instance = next(
+        (i for i in load_instances(dataset_id) if i.get("instance_id") == instance_id), None
+    )
+    if instance is None:
+        typer.echo(f"Unknown instance: {instance_id}", err=True)
+        raise typer.Exit(1)
+    try:
+        tag = docker_snapshot(get_agent_config(agent), instance)
+    except RuntimeError as e:
+        typer.echo(f"Setup failed: {e}", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"Setup snapshot: {tag}")
@@ -0,0 +1,134 @@
+"""Compressed, indexed per-run trajectory store.
+
+All trajectories of a run live in one ``trajectories.jsonl.zst`` file. Each
+record is its own zstd frame holding one JSON line, so the file as a whole
+decompresses as plain JSONL while a single trajectory can be read by seeking to
+its frame. ``trajectories.idx`` is an append-only JSONL index mapping
+(instance_id, attempt) to the frame's offset and length; later entries win.
+
+Appends are serialized with ``flock`` so several workers can share a run dir.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+from pathlib import Path
+from typing import Iterator
+
+DATA_FILE = "trajectories.jsonl.zst"
+INDEX_FILE = "trajectories.idx"
+
+
+class TrajectoryStore:
+    """Append-only zstd JSONL store of trajectories keyed by (instance_id, attempt)."""
+
+    def __init__(self, run_dir: Path, level: int = 10):
+        self.data_path = run_dir / DATA_FILE
+        self.index_path = run_dir / INDEX_FILE
+        self.level = level
+        self._index: dict[tuple[str, int], tuple[int, int]] | None = None
+
+    def _load_index(self) -> dict[tuple[str, int], tuple[int, int]]:
+        index = {}
+        try:
+            with self.index_path.open() as f:
+                for line in f:
+                    try:
+                        e = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn write from a crashed worker
+                    index[(e["instance_id"], e["attempt"])] = (e["offset"], e["length"])
+        except FileNotFoundError:
+            pass
+        return index
+
+    @property
+    def index(self) -> dict[tuple[str, int], tuple[int, int]]:
+        if self._index is None:
+            self._index = self._load_index()
+        return self._index
+
+    def put(self, instance_id: str, attempt: int, trajectory: dict) -> None:
+        """Append a trajectory, replacing any earlier one for the same key."""
+        import zstandard
+
+        line = json.dumps(
+            {"instance_id": instance_id, "attempt": attempt, "trajectory": trajectory}
+        )
+        frame = zstandard.ZstdCompressor(level=self.level).compress(
+            (line + "\n").encode()
+        )
+
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.data_path.open("ab") as data:
+            fcntl.flock(data, fcntl.LOCK_EX)
+            try:
+                offset = data.seek(0, 2)
+                data.write(frame)
+                data.flush()
+                entry = {
+                    "instance_id": instance_id,
+                    "attempt": attempt,
+                    "offset": offset,
+                    "length": len(frame),
+                }
+                with self.index_path.open("a") as idx:
+                    idx.write(json.dumps(entry) + "\n")
+            finally:
+                fcntl.flock(data, fcntl.LOCK_UN)
+
+        self.index[(instance_id, attempt)] = (offset, len(frame))
+
+    def get(self, instance_id: str, attempt: int) -> dict | None:
+        """Load one trajectory without decompressing the rest of the file."""
+        import zstandard
+
+        key = (instance_id, attempt)
+        if key not in self.index:
+            # Another worker may have appended since we loaded the index
+            self._index = self._load_index()
+            if key not in self._index:
+                return None
+
+        offset, length = self.index[key]
+        with self.data_path.open("rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        record = json.loads(zstandard.ZstdDecompressor().decompress(frame))
+        return record["trajectory"]
+
+    def keys(self) -> list[tuple[str, int]]:
+        return sorted(self.index)
+
+    def __iter__(self) -> Iterator[tuple[str, int, dict]]:
+        for iid, attempt in self.keys():
+            trajectory = self.get(iid, attempt)
+            if trajectory is not None:
+                yield iid, attempt, trajectory
+
+
+def load_trajectory(
+    run_dir: Path, instance_id: str, attempt: int, store: TrajectoryStore | None = None
+) -> dict | None:
+    """Load a trajectory from the run's store, falling back to a legacy trajectory.json.
+
+    Pass ``store`` (a ``TrajectoryStore`` for ``run_dir``) when loading many
+    trajectories, so the index is parsed once rather than on every call.
+    """
+    if store is not None:
+        # Only keys in the loaded index; a miss would re-read the whole index
+        if (instance_id, attempt) in store.index:
+            trajectory = store.get(instance_id, attempt)
+            if trajectory is not None:
+                return trajectory
+    elif (run_dir / INDEX_FILE).exists():
+        trajectory = TrajectoryStore(run_dir).get(instance_id, attempt)
+        if trajectory is not None:
+            return trajectory
+
+    legacy = run_dir / instance_id / f"attempt_{attempt}" / "rollout" / "trajectory.json"
+    try:
+        return json.loads(legacy.read_text())
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return None
@@ -6,7 +6,10 @@ from typing import Sequence
 import typer
 
 from . import __version__
+from .agents.snapshots import snapshot_setup
+from .evals.merge import merge_runs
 from .publish import publish_images
+from .resources import recommend_resources
 from .run_evals import run_evals
 from .wizard.commands import add_task, init_dataset, validate_dataset
 from .wizard.converters import convert_dataset
@@ -23,6 +26,9 @@ except ImportError:
 app = typer.Typer(help="AQ Project Anvil - SWE-Bench Pro Tasks", no_args_is_help=True)
 app.command("publish-images", no_args_is_help=True)(publish_images)
 app.command("run-evals", no_args_is_help=True)(run_evals)
+app.command("recommend-resources", no_args_is_help=True)(recommend_resources)
+app.command("merge-runs", no_args_is_help=True)(merge_runs)
+app.command("snapshot-setup", no_args_is_help=True)(snapshot_setup)
 
 # Task creation wizard commands
 app.command("init-dataset", no_args_is_help=True)(init_dataset)
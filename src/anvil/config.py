@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 
@@ -39,6 +40,14 @@ def eval_dir(dataset_id: str, eval_id: str) -> Path:
 eval_output_dir = eval_dir
 
 
+def cache_dir() -> Path:
+    """Return the persistent cache directory (override with ANVIL_CACHE_DIR)."""
+    override = os.environ.get("ANVIL_CACHE_DIR")
+    if override:
+        return Path(override).expanduser()
+    return Path.home() / ".cache" / "anvil"
+
+
 def swe_bench_eval_script() -> Path:
     """Return the path to the SWE-bench Pro evaluation script."""
     return Path(__file__).parent / "_vendor" / "swe_bench_pro" / "swe_bench_pro_eval.py"
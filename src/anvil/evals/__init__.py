@@ -8,7 +8,8 @@ from .pass_at_k import (
     print_pass_at_k_summary,
     save_pass_at_k_json,
 )
-from .runner import run_evaluation
+from .metrics import RunMetrics, extract_run_metrics
+from .runner import load_matrix, run_evaluation, run_matrix
 
 __all__ = [
     "estimate_pass_at_k",
@@ -17,5 +18,9 @@ __all__ = [
     "compute_pass_at_k_summary",
     "print_pass_at_k_summary",
     "save_pass_at_k_json",
+    "RunMetrics",
+    "extract_run_metrics",
     "run_evaluation",
+    "run_matrix",
+    "load_matrix",
 ]
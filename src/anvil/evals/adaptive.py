@@ -0,0 +1,72 @@
+"""Adaptive sequential sampling for pass@k.
+
+Instead of running exactly k attempts per instance, attempts are scheduled in
+rounds of one attempt per instance. After each round, an instance stops
+once more attempts can no longer move its pass@k estimate by more than a
+tolerance, or once it reaches its attempt budget.
+
+"Can no longer move" uses exact bounds, not a confidence interval. Suppose the
+instance were sampled up to the budget. The lowest possible final estimate
+is when every remaining attempt fails, and the highest is when every one
+passes. With a budget of k, an instance that has passed once has pass@k = 1
+whatever happens next, so it stops after its first success. Instances that
+keep failing run up to the budget.
+"""
+
+from __future__ import annotations
+
+from .pass_at_k import estimate_pass_at_k
+
+
+def pass_at_k_bounds(n: int, c: int, k: int, budget: int) -> tuple[float, float]:
+    """Range of the pass@k estimate after ``budget`` attempts, given ``c`` of ``n`` passed."""
+    remaining = max(budget - n, 0)
+    return (
+        estimate_pass_at_k(max(budget, n), c, k),
+        estimate_pass_at_k(max(budget, n), c + remaining, k),
+    )
+
+
+def is_determined(n: int, c: int, k: int, budget: int, tolerance: float) -> bool:
+    if n >= budget:
+        return True
+    low, high = pass_at_k_bounds(n, c, k, budget)
+    return high - low <= tolerance
+
+
+def next_round(
+    results: dict[str, dict[int, bool]], k: int, budget: int, tolerance: float
+) -> list[tuple[str, int]]:
+    """Next attempt of every instance whose estimate is not determined yet.
+
+    ``results`` maps instance_id to {attempt: passed} for evaluated attempts.
+    """
+    pairs = []
+    for iid, by_attempt in sorted(results.items()):
+        n, c = len(by_attempt), sum(by_attempt.values())
+        if not is_determined(n, c, k, budget, tolerance):
+            pairs.append((iid, max(by_attempt, default=0) + 1))
+    return pairs
+
+
+def savings_summary(
+    attempts_run: int,
+    n_tasks: int,
+    k: int,
+    budget: int,
+    tolerance: float,
+    mean_rollout_seconds: float | None,
+) -> dict:
+    """Compute used by the adaptive run compared with running k attempts on every task."""
+    fixed = n_tasks * k
+    saved = fixed - attempts_run
+    return {
+        "budget": budget,
+        "tolerance": tolerance,
+        "attempts": attempts_run,
+        "fixed_k_attempts": fixed,
+        "attempts_saved": saved,
+        "rollout_seconds_saved": (
+            saved * mean_rollout_seconds if mean_rollout_seconds is not None else None
+        ),
+    }
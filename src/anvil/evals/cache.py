@@ -0,0 +1,97 @@
+"""Content-addressed cache of evaluation outputs.
+
+Evaluating a patch is deterministic given the image content, base commit,
+patch, run script, parser and entry script (which carries the selected tests
+and image ENV). The image is identified by its registry digest or local image
+ID rather than its tag, which can be pushed again with different contents. ``EvalCache`` stores the parsed test output (``output.json``) under a
+hash of those inputs in ``<cache_dir>/eval_cache.db``, so identical patches
+across attempts, runs and models -- empty patches from failed rollouts, gold
+patches on oracle re-runs -- are served without a sandbox.
+
+Only parsed outputs of runs whose entry script exited cleanly are cached;
+grading against fail_to_pass/pass_to_pass is cheap and done per attempt.
+"""
+
+from __future__ import annotations
+
+import copy
+import hashlib
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from ..config import cache_dir
+
+CACHE_FILE = "eval_cache.db"
+
+
+def normalize_patch(patch: str) -> str:
+    """Drop differences that don't change what the patch applies.
+
+    Only ``index`` header lines go: their blob hashes vary with unrelated repo
+    state. Line endings and surrounding whitespace are kept, since either can
+    decide whether ``git apply`` succeeds.
+    """
+    lines = patch.split("\n")
+    return "\n".join(line for line in lines if not line.startswith("index "))
+
+
+class EvalCache:
+    """SQLite-backed map from evaluation inputs to parsed test output."""
+
+    def __init__(self, path: Path | None = None):
+        self.path = path or cache_dir() / CACHE_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            "key TEXT PRIMARY KEY, output TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(
+        image_digest: str,
+        base_commit: str,
+        patch: str,
+        run_script: str,
+        parser: str,
+        entryscript: str,
+    ) -> str:
+        h = hashlib.sha256()
+        for part in (image_digest, base_commit, normalize_patch(patch), run_script, parser, entryscript):
+            data = part.encode()
+            # Length-prefix each part so boundaries can't shift between fields
+            h.update(len(data).to_bytes(8, "big"))
+            h.update(data)
+        return h.hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        row = self.conn.execute("SELECT output FROM outputs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, output: dict) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO outputs (key, output, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(output), time.time()),
+            )
+
+    def view(self) -> EvalCache:
+        """The same store with its own hit/miss counts (e.g. one per run in a session)."""
+        view = copy.copy(self)
+        view.hits = view.misses = 0
+        return view
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,72 @@
+"""Expected rollout and eval durations from past runs, for balancing and ordering work."""
+
+from __future__ import annotations
+
+import sqlite3
+import statistics
+
+from ..config import runs_dir
+from .state import STATE_FILE
+
+
+def expected_durations(dataset_id: str) -> tuple[dict[str, float], dict[str, float]]:
+    """Median observed rollout and eval seconds per instance, from every run's state.db."""
+    rollouts: dict[str, list[float]] = {}
+    evals: dict[str, list[float]] = {}
+    root = runs_dir(dataset_id)
+    if not root.exists():
+        return {}, {}
+    for db in root.glob(f"**/{STATE_FILE}"):
+        try:
+            conn = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(
+                    "SELECT instance_id, rollout_seconds, eval_seconds FROM attempts"
+                ).fetchall()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            # Unreadable, or written before eval durations were recorded
+            continue
+        for iid, rollout_seconds, eval_seconds in rows:
+            if rollout_seconds:
+                rollouts.setdefault(iid, []).append(rollout_seconds)
+            if eval_seconds:
+                evals.setdefault(iid, []).append(eval_seconds)
+    return (
+        {iid: statistics.median(values) for iid, values in rollouts.items()},
+        {iid: statistics.median(values) for iid, values in evals.items()},
+    )
+
+
+def _repo(instance: dict) -> str:
+    return instance.get("repo_name") or instance["instance_id"].partition(".")[0]
+
+
+def _with_priors(observed: dict[str, float], instances: list[dict]) -> dict[str, float]:
+    """Fill instances without history from their repo's median, then the dataset's."""
+    by_repo: dict[str, list[float]] = {}
+    for inst in instances:
+        if inst["instance_id"] in observed:
+            by_repo.setdefault(_repo(inst), []).append(observed[inst["instance_id"]])
+    overall = statistics.median(observed.values()) if observed else 0.0
+    filled = {}
+    for inst in instances:
+        iid = inst["instance_id"]
+        if iid in observed:
+            filled[iid] = observed[iid]
+        elif _repo(inst) in by_repo:
+            filled[iid] = statistics.median(by_repo[_repo(inst)])
+        else:
+            filled[iid] = overall
+    return filled
+
+
+def predict_durations(dataset_id: str, instances: list[dict]) -> dict[str, float]:
+    """Expected rollout + eval seconds per instance; empty if the dataset has no history."""
+    rollouts, evals = expected_durations(dataset_id)
+    if not rollouts and not evals:
+        return {}
+    rollouts = _with_priors(rollouts, instances)
+    evals = _with_priors(evals, instances)
+    return {i["instance_id"]: rollouts[i["instance_id"]] + evals[i["instance_id"]] for i in instances}
@@ -0,0 +1,105 @@
+"""Merge sharded run outputs into one set of results."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import typer
+
+from ..agents.harness import load_instances
+from ..config import eval_output_dir
+from .pass_at_k import compute_pass_at_k_summary, print_pass_at_k_summary, save_pass_at_k_json
+from .sharding import MANIFEST_FILE, read_manifest
+from .state import STATE_FILE, RunState
+
+
+def _fail(message: str) -> None:
+    typer.echo(f"Error: {message}", err=True)
+    raise typer.Exit(1)
+
+
+def _report(label: str, keys: list[tuple[str, int]]) -> None:
+    typer.echo(f"{label}: {len(keys)}", err=True)
+    for iid, attempt in keys[:10]:
+        typer.echo(f"  {iid}:attempt_{attempt}", err=True)
+    if len(keys) > 10:
+        typer.echo(f"  ... and {len(keys) - 10} more", err=True)
+
+
+def merge_runs(
+    run_dirs: list[Path] = typer.Argument(..., help="Shard output directories"),
+    output: str | None = typer.Option(
+        None, "--output", help="Directory for merged results (default: the run's output dir)"
+    ),
+) -> None:
+    """Merge `run-evals --shard` outputs, checking for gaps and overlaps."""
+    manifests = []
+    for d in run_dirs:
+        if not (d / MANIFEST_FILE).exists() or not (d / STATE_FILE).exists():
+            _fail(f"{d} is not a sharded run directory")
+        manifests.append(read_manifest(d))
+
+    first = manifests[0]
+    for d, m in zip(run_dirs, manifests):
+        if m["plan_digest"] != first["plan_digest"] or m["eval_id"] != first["eval_id"]:
+            _fail(f"{d} belongs to a different run or shard plan than {run_dirs[0]}")
+
+    indexes = [m["index"] for m in manifests]
+    duplicates = sorted({i for i in indexes if indexes.count(i) > 1})
+    if duplicates:
+        _fail(f"shard(s) {', '.join(map(str, duplicates))} given more than once")
+    missing = sorted(set(range(1, first["count"] + 1)) - set(indexes))
+    if missing:
+        _fail(f"missing shard(s) {', '.join(map(str, missing))} of {first['count']}")
+
+    dataset_id, k, plan = first["dataset"], first["k"], first["plan"]
+    instances = load_instances(dataset_id)
+    # The oracle only evaluates attempt 1
+    max_attempt = 1 if first["agent"] == "oracle" else k
+    expected = [
+        (i["instance_id"], a) for i in instances for a in range(1, max_attempt + 1)
+    ]
+
+    results: dict[tuple[str, int], bool] = {}
+    overlaps: list[tuple[str, int]] = []
+    duration = 0.0
+    for d, m in zip(run_dirs, manifests):
+        assigned = set(plan[m["index"] - 1])
+        state = RunState(d)
+        for key, a in state.attempts().items():
+            if not a.eval_done:
+                continue
+            if key not in assigned or key in results:
+                overlaps.append(key)
+                continue
+            results[key] = a.eval_passed
+        state.close()
+        try:
+            summary = json.loads((d / "eval_results_pass_at_k.json").read_text())
+            duration = max(duration, summary["metadata"]["duration_seconds"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    gaps = [key for key in expected if key not in results]
+    if gaps or overlaps:
+        if gaps:
+            _report("Attempts with no eval result", gaps)
+        if overlaps:
+            _report("Attempts evaluated outside their shard or more than once", sorted(overlaps))
+        raise typer.Exit(1)
+
+    out = Path(output) if output else eval_output_dir(dataset_id, first["eval_id"])
+    out.mkdir(parents=True, exist_ok=True)
+    merged = {f"{iid}:attempt_{a}": results[(iid, a)] for iid, a in expected}
+    (out / "eval_results.json").write_text(json.dumps(merged, indent=2))
+
+    eval_results: dict[str, list[bool]] = {}
+    for iid, a in expected:
+        eval_results.setdefault(iid, []).append(results[(iid, a)])
+    summary = compute_pass_at_k_summary(
+        eval_results, first["model"], dataset_id, first["agent"], k, duration
+    )
+    typer.echo(f"Merged {len(run_dirs)} shards ({len(expected)} attempts) into {out}")
+    print_pass_at_k_summary(summary)
+    save_pass_at_k_json(summary, out / "eval_results_pass_at_k.json")
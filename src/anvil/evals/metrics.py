@@ -0,0 +1,188 @@
+"""Per-step latency, token and cost metrics extracted from agent trajectories."""
+
+from __future__ import annotations
+
+import csv
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+
+from ..agents.trajectory_store import TrajectoryStore, load_trajectory
+
+STEP_METRICS_FILE = "step_metrics.csv"
+
+
+@dataclass
+class StepMetrics:
+    instance_id: str
+    attempt: int
+    step: int
+    model_latency_s: float | None
+    exec_latency_s: float | None
+    prompt_tokens: int | None
+    completion_tokens: int | None
+    cost: float | None
+
+
+@dataclass
+class RunMetrics:
+    n_steps: int
+    step_latency_p50: float | None
+    step_latency_p95: float | None
+    prompt_tokens: int
+    completion_tokens: int
+    total_cost: float
+    tokens_per_solved_task: float | None
+    cost_per_attempt: float | None
+
+
+def _timestamp(message: dict) -> float | None:
+    ts = message.get("timestamp")
+    if ts is None:
+        ts = (message.get("extra") or {}).get("timestamp")
+    return float(ts) if isinstance(ts, (int, float)) else None
+
+
+def extract_steps(instance_id: str, attempt: int, trajectory: dict) -> list[StepMetrics]:
+    """Walk a mini-swe-agent trajectory and return one row per model call.
+
+    Latencies need per-message timestamps (newer mini-swe-agent versions record
+    them); tokens come from the litellm response usage stored in ``extra``.
+    """
+    messages = trajectory.get("messages") or []
+    steps = []
+    for i, msg in enumerate(messages):
+        if msg.get("role") != "assistant":
+            continue
+        extra = msg.get("extra") or {}
+        response = extra.get("response") or {}
+        usage = response.get("usage") or {}
+
+        ts = _timestamp(msg)
+        prev_ts = _timestamp(messages[i - 1]) if i > 0 else None
+        next_ts = _timestamp(messages[i + 1]) if i + 1 < len(messages) else None
+
+        model_latency = ts - prev_ts if ts is not None and prev_ts is not None else None
+        exec_latency = next_ts - ts if ts is not None and next_ts is not None else None
+
+        cost = extra.get("cost")
+        if cost is None:
+            cost = (response.get("_hidden_params") or {}).get("response_cost")
+
+        steps.append(
+            StepMetrics(
+                instance_id=instance_id,
+                attempt=attempt,
+                step=len(steps) + 1,
+                model_latency_s=model_latency,
+                exec_latency_s=exec_latency,
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens"),
+                cost=cost,
+            )
+        )
+    return steps
+
+
+def _attempt_cost(trajectory: dict, steps: list[StepMetrics]) -> float:
+    """Total model cost of an attempt; model_stats is authoritative when present."""
+    stats = (trajectory.get("info") or {}).get("model_stats") or {}
+    if stats.get("instance_cost") is not None:
+        return float(stats["instance_cost"])
+    return sum(s.cost or 0.0 for s in steps)
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def extract_run_metrics(
+    run_dir: Path,
+    attempts: dict[str, list[int]],
+    solved: set[str],
+) -> RunMetrics | None:
+    """Extract per-step metrics for a run, write step_metrics.csv and return the roll-up.
+
+    ``attempts`` maps instance_id to the attempt numbers to read; ``solved`` is
+    the set of instances with at least one passing attempt. Returns None when
+    the run has no trajectories (e.g. the oracle agent).
+    """
+    rows: list[StepMetrics] = []
+    costs: list[float] = []
+    store = TrajectoryStore(run_dir)
+    for iid, attempt_nums in attempts.items():
+        for attempt in attempt_nums:
+            trajectory = load_trajectory(run_dir, iid, attempt, store)
+            if not trajectory:
+                continue
+            steps = extract_steps(iid, attempt, trajectory)
+            rows.extend(steps)
+            costs.append(_attempt_cost(trajectory, steps))
+
+    if not costs:
+        return None
+
+    with (run_dir / STEP_METRICS_FILE).open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=[fl.name for fl in fields(StepMetrics)])
+        writer.writeheader()
+        writer.writerows(asdict(r) for r in rows)
+
+    latencies = [r.model_latency_s for r in rows if r.model_latency_s is not None]
+    prompt = sum(r.prompt_tokens or 0 for r in rows)
+    completion = sum(r.completion_tokens or 0 for r in rows)
+    total_cost = sum(costs)
+    return RunMetrics(
+        n_steps=len(rows),
+        step_latency_p50=percentile(latencies, 0.5),
+        step_latency_p95=percentile(latencies, 0.95),
+        prompt_tokens=prompt,
+        completion_tokens=completion,
+        total_cost=total_cost,
+        tokens_per_solved_task=(prompt + completion) / len(solved) if solved else None,
+        cost_per_attempt=total_cost / len(costs),
+    )
+
+
+def summarize_phases(phases: list[dict[str, float]]) -> dict[str, dict[str, float]]:
+    """Roll per-rollout phase durations up into count/mean/p50/p95/total per phase."""
+    by_phase: dict[str, list[float]] = {}
+    for p in phases:
+        for name, seconds in p.items():
+            by_phase.setdefault(name, []).append(seconds)
+    return {
+        name: {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": percentile(values, 0.5),
+            "p95": percentile(values, 0.95),
+            "total": sum(values),
+        }
+        for name, values in by_phase.items()
+    }
+
+
+def summarize_schedule(
+    durations: list[tuple[float, float]], makespan_seconds: float, max_parallel: int
+) -> dict[str, float]:
+    """Compare predicted with actual attempt durations and the makespan with its lower bound.
+
+    ``durations`` holds (predicted, actual) seconds per attempt. No schedule
+    can finish before the longest attempt, or before the total work spread
+    over ``max_parallel`` slots, so the larger of the two is the lower bound.
+    """
+    actual = [a for _, a in durations]
+    lower_bound = max(sum(actual) / max_parallel, max(actual))
+    return {
+        "attempts": len(durations),
+        "mean_abs_error_seconds": sum(abs(p - a) for p, a in durations) / len(durations),
+        "predicted_total_seconds": sum(p for p, _ in durations),
+        "actual_total_seconds": sum(actual),
+        "makespan_seconds": makespan_seconds,
+        "lower_bound_seconds": lower_bound,
+        "efficiency": lower_bound / makespan_seconds if makespan_seconds else 1.0,
+    }
@@ -5,11 +5,13 @@ from __future__ import annotations
 import json
 import math
 import re
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from pathlib import Path
 
 import typer
 
+from .metrics import RunMetrics
+
 
 def estimate_pass_at_k(n: int, c: int, k: int) -> float:
     """Compute pass@k = 1 - C(n-c, k) / C(n, k)."""
@@ -44,6 +46,14 @@ class PassAtKSummary:
     aggregate_pass_at_1: float
     aggregate_pass_at_k: float
     per_instance: list[PassAtKResult]
+    metrics: RunMetrics | None = None
+    eval_cache: dict[str, int] | None = None  # hits/misses for this invocation
+    adaptive: dict | None = None  # attempts used vs fixed k, see adaptive.savings_summary
+
+    @property
+    def pass_at_1_biased(self) -> bool:
+        """Adaptive runs stop attempting a task early, so its success rate isn't pass@1."""
+        return self.adaptive is not None and self.k > 1
 
 
 def compute_pass_at_k_summary(
@@ -53,6 +63,9 @@ def compute_pass_at_k_summary(
     agent: str,
     k: int,
     duration_seconds: float,
+    metrics: RunMetrics | None = None,
+    eval_cache: dict[str, int] | None = None,
+    adaptive: dict | None = None,
 ) -> PassAtKSummary:
     per_instance = []
     for instance_id, results in sorted(results_by_instance.items()):
@@ -84,6 +97,9 @@ def compute_pass_at_k_summary(
         if n_tasks
         else 0.0,
         per_instance=per_instance,
+        metrics=metrics,
+        eval_cache=eval_cache,
+        adaptive=adaptive,
     )
 
 
@@ -102,20 +118,50 @@ def print_pass_at_k_summary(summary: PassAtKSummary) -> None:
     echo(f"  Attempts:    k={summary.k} ({summary.total_runs} runs, {m}m {s}s)")
     echo("")
     echo("─" * 75)
-    echo(f"  pass@1:    {summary.aggregate_pass_at_1:5.1%}")
+    show_pass_at_1 = not summary.pass_at_1_biased
+    if show_pass_at_1:
+        echo(f"  pass@1:    {summary.aggregate_pass_at_1:5.1%}")
+    else:
+        echo("  pass@1:    n/a (biased by adaptive early stopping)")
     if summary.k > 1:
         solved = sum(1 for r in summary.per_instance if r.solved)
         echo(
             f"  pass@{summary.k}:    {summary.aggregate_pass_at_k:5.1%}   ({solved}/{summary.n_tasks} solved)"
         )
+    if summary.metrics:
+        mt = summary.metrics
+        if mt.step_latency_p50 is not None:
+            echo(
+                f"  step latency: p50 {mt.step_latency_p50:.1f}s, p95 {mt.step_latency_p95:.1f}s"
+                f" ({mt.n_steps} steps)"
+            )
+        tokens = (
+            f"{mt.tokens_per_solved_task:,.0f} tokens/solved task"
+            if mt.tokens_per_solved_task is not None
+            else f"{mt.prompt_tokens + mt.completion_tokens:,} tokens, none solved"
+        )
+        echo(f"  {tokens}, ${mt.cost_per_attempt:.4f}/attempt")
+    if summary.eval_cache:
+        hits, lookups = summary.eval_cache["hits"], sum(summary.eval_cache.values())
+        if lookups:
+            echo(f"  eval cache: {hits}/{lookups} hits ({hits / lookups:.0%})")
+    if summary.adaptive:
+        ad = summary.adaptive
+        saved, seconds = ad["attempts_saved"], ad["rollout_seconds_saved"]
+        line = f"  adaptive: {ad['attempts']}/{ad['fixed_k_attempts']} attempts ("
+        line += f"{saved} saved" if saved >= 0 else f"{-saved} more"
+        line += f" vs fixed k={summary.k}"
+        if seconds is not None:
+            line += f", ~{abs(seconds) / 3600:.1f} rollout-hours"
+        echo(line + ")")
     echo("")
     echo("─" * 75)
+    header = f"  {'Task':<40} {'Result':<12}"
+    if show_pass_at_1:
+        header += f" {'pass@1':<8}"
     if summary.k > 1:
-        echo(
-            f"  {'Task':<40} {'Result':<12} {'pass@1':<8} {'pass@' + str(summary.k):<8}"
-        )
-    else:
-        echo(f"  {'Task':<40} {'Result':<12} {'pass@1':<8}")
+        header += f" {'pass@' + str(summary.k):<8}"
+    echo(header)
     echo("  " + "─" * 71)
 
     def _sort_key(x):
@@ -130,19 +176,21 @@ def print_pass_at_k_summary(summary: PassAtKSummary) -> None:
         fill_count = round(5 * r.successes / r.attempts) if r.attempts > 0 else 0
         bar = "█" * fill_count + "░" * (5 - fill_count)
         status = "✓" if r.solved else "✗"
+        row = f"  {name:<40} {bar} {r.successes}/{r.attempts:<5}"
+        if show_pass_at_1:
+            row += f" {r.pass_at_1:5.0%}   "
         if summary.k > 1:
-            echo(
-                f"  {name:<40} {bar} {r.successes}/{r.attempts:<5} {r.pass_at_1:5.0%}    {r.pass_at_k:5.0%}    {status}"
-            )
-        else:
-            echo(
-                f"  {name:<40} {bar} {r.successes}/{r.attempts:<5} {r.pass_at_1:5.0%}    {status}"
-            )
+            row += f" {r.pass_at_k:5.0%}   "
+        echo(f"{row} {status}")
 
     echo("═" * 75)
 
 
-def save_pass_at_k_json(summary: PassAtKSummary, output_path: Path) -> None:
+def save_pass_at_k_json(
+    summary: PassAtKSummary, output_path: Path, echo: bool = True
+) -> None:
+    """Write the summary as JSON, leaving out pass@1 when it is biased (see ``pass_at_1_biased``)."""
+    show_pass_at_1 = not summary.pass_at_1_biased
     data = {
         "metadata": {
             "model": summary.model,
@@ -154,14 +202,17 @@ def save_pass_at_k_json(summary: PassAtKSummary, output_path: Path) -> None:
             "duration_seconds": summary.duration_seconds,
         },
         "aggregate": {
-            "pass_at_1": summary.aggregate_pass_at_1,
+            **({"pass_at_1": summary.aggregate_pass_at_1} if show_pass_at_1 else {}),
             f"pass_at_{summary.k}": summary.aggregate_pass_at_k,
         },
+        "metrics": asdict(summary.metrics) if summary.metrics else None,
+        "eval_cache": summary.eval_cache,
+        "adaptive": summary.adaptive,
         "per_instance": {
             r.instance_id: {
                 "attempts": r.attempts,
                 "successes": r.successes,
-                "pass_at_1": r.pass_at_1,
+                **({"pass_at_1": r.pass_at_1} if show_pass_at_1 else {}),
                 f"pass_at_{summary.k}": r.pass_at_k,
                 "solved": r.solved,
             }
@@ -169,4 +220,5 @@ def save_pass_at_k_json(summary: PassAtKSummary, output_path: Path) -> None:
         },
     }
     output_path.write_text(json.dumps(data, indent=2))
-    typer.echo(f"Results: {output_path}")
+    if echo:
+        typer.echo(f"Results: {output_path}")
@@ -6,10 +6,11 @@ This module orchestrates running agents on datasets and evaluating their output.
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
 import os
 import shutil
-import subprocess
+import statistics
 import sys
 import time
 from pathlib import Path
@@ -21,16 +22,37 @@ from ..agents.harness import (
     AGENT_CONFIGS,
     AgentResult,
     load_instances,
-    run_agent_in_modal,
+    run_agent_with_retries,
     write_single_result,
 )
-from ..config import eval_output_dir, swe_bench_eval_script, tasks_dir
+from ..agents.errors import RetryPolicy
+from ..agents.trajectory_store import TrajectoryStore
+from ..config import eval_output_dir, tasks_dir
 from ..util import ensure_dir, model_id_from_model, provider_env_var_from_model
+from .adaptive import next_round, savings_summary
+from .cache import EvalCache
+from .history import predict_durations
+from .metrics import extract_run_metrics, summarize_phases, summarize_schedule
 from .pass_at_k import (
     compute_pass_at_k_summary,
     print_pass_at_k_summary,
     save_pass_at_k_json,
 )
+from .session import RunSession
+from .sharding import (
+    MANIFEST_FILE,
+    ShardSpec,
+    plan_digest,
+    plan_shards,
+    read_manifest,
+    write_manifest,
+)
+from .state import ROLLOUT_FAILED, STATE_FILE, AttemptState, RunState, worker_id
+
+# Work-queue leases: renewed every LEASE_SECONDS / 3 while held, reclaimable once expired
+LEASE_SECONDS = 120
+# How often an idle worker checks whether other workers' leases have expired
+POLL_SECONDS = 30
 
 
 def _eval_id(agent: str, model: str) -> str:
@@ -42,103 +64,100 @@ def _eval_id(agent: str, model: str) -> str:
     return f"{agent}_{base}" if agent else base
 
 
-def _get_completed_rollouts(
-    base_out: Path, instances: list[dict], k: int
-) -> set[tuple[str, int]]:
-    """Return set of (instance_id, attempt) pairs that have valid completed rollouts."""
-    completed = set()
-    for inst in instances:
-        iid = inst["instance_id"]
-        for attempt in range(1, k + 1):
-            meta_path = (
-                base_out / iid / f"attempt_{attempt}" / "rollout" / "metadata.json"
-            )
-            if meta_path.exists():
-                try:
-                    meta = json.loads(meta_path.read_text())
-                    if meta.get("exit_code") == 0 and meta.get("error") is None:
-                        completed.add((iid, attempt))
-                except (json.JSONDecodeError, OSError):
-                    pass
-    return completed
-
-
-def _get_completed_evals(
-    base_out: Path, instances: list[dict], k: int, eval_id: str
-) -> set[tuple[str, int]]:
-    """Return set of (instance_id, attempt) pairs that have valid completed evals."""
-    completed = set()
-    for inst in instances:
-        iid = inst["instance_id"]
-        for attempt in range(1, k + 1):
-            results_path = (
-                base_out
-                / iid
-                / f"attempt_{attempt}"
-                / "eval_results"
-                / "eval_results.json"
-            )
-            if results_path.exists():
-                try:
-                    json.loads(results_path.read_text())
-                    completed.add((iid, attempt))
-                except (json.JSONDecodeError, OSError):
-                    pass
-    return completed
-
-
-def _cleanup_bad_rollouts(base_out: Path, instances: list[dict], k: int) -> int:
-    """Move bad rollouts to __errors/ folder. Returns count moved."""
+def _cleanup_bad_rollouts(
+    base_out: Path, state: RunState, attempts: dict[tuple[str, int], AttemptState]
+) -> int:
+    """Move failed rollouts to __errors/ folder and drop them from the state. Returns count moved."""
     errors_dir = base_out / "__errors"
     moved = 0
 
-    for inst in instances:
-        iid = inst["instance_id"]
-        for attempt in range(1, k + 1):
-            attempt_dir = base_out / iid / f"attempt_{attempt}"
-            meta_path = attempt_dir / "rollout" / "metadata.json"
-
-            if meta_path.exists():
-                try:
-                    meta = json.loads(meta_path.read_text())
-                    if meta.get("exit_code") != 0 or meta.get("error") is not None:
-                        dst = errors_dir / iid / f"attempt_{attempt}"
-                        dst.parent.mkdir(parents=True, exist_ok=True)
-                        if dst.exists():
-                            shutil.rmtree(dst)
-                        shutil.move(str(attempt_dir), str(dst))
-                        moved += 1
-                except (json.JSONDecodeError, OSError):
-                    pass
+    for (iid, attempt), a in attempts.items():
+        if a.rollout_status != ROLLOUT_FAILED:
+            continue
+        attempt_dir = base_out / iid / f"attempt_{attempt}"
+        if attempt_dir.exists():
+            dst = errors_dir / iid / f"attempt_{attempt}"
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if dst.exists():
+                shutil.rmtree(dst)
+            shutil.move(str(attempt_dir), str(dst))
+            moved += 1
+        state.forget(iid, attempt)
 
     return moved
 
 
-def _cleanup_bad_evals(
-    base_out: Path, instances: list[dict], k: int, eval_id: str
-) -> int:
-    """Move bad eval results to __errors/ folder. Returns count moved."""
+def _cleanup_bad_evals(base_out: Path, pending: list[tuple[str, int]]) -> int:
+    """Move partial eval results of pending evals to __errors/ folder. Returns count moved."""
     errors_dir = base_out / "__errors"
     moved = 0
 
-    for inst in instances:
-        iid = inst["instance_id"]
-        for attempt in range(1, k + 1):
-            eval_dir = base_out / iid / f"attempt_{attempt}" / "eval_results"
-            results_path = eval_dir / "eval_results.json"
+    for iid, attempt in pending:
+        eval_dir = base_out / iid / f"attempt_{attempt}" / "eval_results"
+        results_path = eval_dir / "eval_results.json"
 
-            if eval_dir.exists() and not results_path.exists():
-                dst = errors_dir / iid / f"attempt_{attempt}" / "eval_results"
-                dst.parent.mkdir(parents=True, exist_ok=True)
-                if dst.exists():
-                    shutil.rmtree(dst)
-                shutil.move(str(eval_dir), str(dst))
-                moved += 1
+        if eval_dir.exists() and not results_path.exists():
+            dst = errors_dir / iid / f"attempt_{attempt}" / "eval_results"
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            if dst.exists():
+                shutil.rmtree(dst)
+            shutil.move(str(eval_dir), str(dst))
+            moved += 1
 
     return moved
 
 
-def run_evaluation(
+def _patch_entry(iid: str, patch: str, eval_id: str, attempt: int) -> dict:
+    return {"instance_id": iid, "patch": patch, "prefix": eval_id, "attempt": attempt}
+
+
+def _read_pred_patch(base_out: Path, iid: str, attempt: int) -> str:
+    """Read the model patch from a completed rollout's .pred file."""
+    pred_path = base_out / iid / f"attempt_{attempt}" / "rollout" / f"{iid}.pred"
+    try:
+        return json.loads(pred_path.read_text()).get("model_patch", "")
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        return ""
+
+
+def _adaptive_pairs(
+    attempts: dict[tuple[str, int], AttemptState],
+    instances: list[dict],
+    budget: int,
+    evaluated_only: bool = True,
+) -> list[tuple[str, int]]:
+    """Attempts of an adaptive run recorded in the state, within the per-instance budget."""
+    ids = {i["instance_id"] for i in instances}
+    return sorted(
+        key for key, a in attempts.items()
+        if key[0] in ids and key[1] <= budget and (a.eval_done or not evaluated_only)
+    )
+
+
+def _sandbox_eval_files(iid: str, sample, dataset_tasks_dir: Path) -> dict[str, str] | None:
+    """Evaluator files for grading an attempt inside its rollout sandbox, if available."""
+    from .._vendor.swe_bench_pro.swe_bench_pro_eval import assemble_workspace_files
+
+    try:
+        files, _ = assemble_workspace_files(
+            iid,
+            str(dataset_tasks_dir / "run_scripts"),
+            "",
+            sample,
+            str(dataset_tasks_dir / "dockerfiles"),
+        )
+    except OSError:
+        return None
+    files.pop("patch.diff")  # The sandbox uses the patch it just captured
+    return files
+
+
+def run_evaluation(*args, **kwargs) -> int:
+    """Run full evaluation with an agent on a dataset (see ``run_evaluation_async``)."""
+    return asyncio.run(run_evaluation_async(*args, **kwargs))
+
+
+async def run_evaluation_async(
     model: str | None,
     dataset_id: str,
     dockerhub_username: str,
@@ -149,8 +168,24 @@ def run_evaluation(
     max_wait_minutes: int | None = None,
     max_parallel: int = 30,
     no_continue: bool = False,
+    eval_parallel: int | None = None,
+    eval_in_sandbox: bool = False,
+    eval_cache: bool = True,
+    reuse_eval_sandboxes: bool = False,
+    shard: str | None = None,
+    shard_manifest: str | None = None,
+    adaptive: bool = False,
+    tolerance: float = 0.0,
+    max_attempts: int | None = None,
+    session: RunSession | None = None,
+    position: int = 0,
 ) -> int:
-    """Run full evaluation with an agent on a dataset."""
+    """Run full evaluation with an agent on a dataset.
+
+    Pass ``session`` to share Modal objects, caches and the rollout slots with
+    other runs in the same event loop (see ``run_matrix``); ``position`` offsets
+    this run's progress bars.
+    """
     from tqdm import tqdm
 
     # Load .env early for credential check
@@ -189,13 +224,37 @@ def run_evaluation(
         typer.echo("Error: --n-attempts must be at least 1")
         return 1
 
+    # Most attempts any instance may get: k, or the adaptive per-instance budget
+    budget = k
+    if adaptive:
+        if agent == "oracle" or shard:
+            typer.echo("Error: --adaptive can't be combined with the oracle agent or --shard")
+            return 1
+        budget = max_attempts or k
+        if budget < k:
+            typer.echo("Error: --max-attempts must be at least --n-attempts")
+            return 1
+        if not 0 <= tolerance < 1:
+            typer.echo("Error: --tolerance must be in [0, 1)")
+            return 1
+
     # Default max wait = 10 minutes * k / 2 (e.g., k=5 -> 25 min)
     if max_wait_minutes is None:
         max_wait_minutes = max(10, 10 * k // 2)
 
     start_time = time.time()
     eval_id = _eval_id(agent, model)
+    # Runs sharing a session print concurrently; label their lines
+    tag = f"[{eval_id}] " if session else ""
+    try:
+        shard_spec = ShardSpec.parse(shard) if shard else None
+    except ValueError as e:
+        typer.echo(f"Error: {e}")
+        return 1
+
     base_out_path = Path(output) if output else eval_output_dir(dataset_id, eval_id)
+    if shard_spec and not output:
+        base_out_path = base_out_path / shard_spec.dirname
     
     # Handle --no-continue: delete existing results directory
     if no_continue and base_out_path.exists():
@@ -213,8 +272,75 @@ def run_evaluation(
     typer.echo(f"  Attempts: {k}")
     typer.echo(f"  Output: {base_out}")
 
-    # ---- Oracle: skip rollout, use gold_patches.json directly ----
+    # Expected rollout + eval seconds per instance, for longest-first dispatch.
+    # Reading past runs' state.db is skipped when there is nothing to plan.
+    @functools.cache
+    def expected() -> dict[str, float]:
+        durations = predict_durations(dataset_id, instances)
+        if durations:
+            typer.echo("  Dispatch: longest expected first, from past runs")
+        return durations
+
+    def claim_order(keys: list[tuple[str, int]]) -> dict[str, float] | None:
+        """Expected seconds for seeding these attempts; None if all are evaluated."""
+        if all((a := attempts.get(key)) is not None and a.eval_done for key in keys):
+            return None
+        return expected()
+
+    # (instance_id, attempt) pairs this invocation is responsible for
+    pairs = [(i["instance_id"], a) for i in instances for a in range(1, k + 1)]
+    if shard_spec:
+        # Keep the plan a shard started with; otherwise take the given one or plan from history
+        plan_source = Path(shard_manifest) if shard_manifest else base_out / MANIFEST_FILE
+        if plan_source.exists():
+            manifest = read_manifest(plan_source)
+            if (manifest["dataset"], manifest["k"], manifest["count"]) != (
+                dataset_id, k, shard_spec.count
+            ):
+                typer.echo(
+                    f"Error: {plan_source} is for {manifest['dataset']} with "
+                    f"k={manifest['k']} and {manifest['count']} shards"
+                )
+                return 1
+            shards = manifest["plan"]
+        elif shard_manifest:
+            typer.echo(f"Error: shard manifest not found at {shard_manifest}")
+            return 1
+        else:
+            shards = plan_shards(pairs, shard_spec.count, expected())
+        write_manifest(
+            base_out, shard_spec, shards,
+            dataset=dataset_id, eval_id=eval_id, model=model, agent=agent, k=k,
+        )
+        pairs = shards[shard_spec.index - 1]
+        typer.echo(
+            f"  Shard: {shard_spec} ({len(pairs)} attempts, plan {plan_digest(shards)})"
+        )
+    in_run = set(pairs)
+    instances_by_id = {i["instance_id"]: i for i in instances}
+
+    # ---- Work to do: the run's attempts, queued in state.db ----
+    # Workers pointed at the same output dir share this queue; each holds a
+    # lease on the attempts it is working on until their evals are recorded
+    state = RunState(base_out)
+    worker = worker_id()
+    imported = state.import_tree(instances, k)
+    if imported:
+        typer.echo(f"Imported {imported} existing attempts into {STATE_FILE}")
+    reclaimed = state.release_dead_workers()
+    if reclaimed:
+        typer.echo(f"Reclaimed attempts of {reclaimed} exited worker(s) on this host")
+    attempts = state.attempts()
+    if adaptive:
+        # Start from what this run already has and one more round for every instance
+        pairs = _adaptive_pairs(attempts, instances, budget, evaluated_only=False)
+        pairs = sorted(set(pairs) | {(i["instance_id"], 1) for i in instances})
+        in_run.clear()
+        in_run.update(pairs)
+
+    gold_by_instance: dict[str, str] = {}
     if agent == "oracle":
+        # Oracle: skip rollout, use gold_patches.json directly
         gold_patches_path = dataset_tasks_dir / "gold_patches.json"
         if not gold_patches_path.exists():
             typer.echo(f"Error: gold_patches.json not found at {gold_patches_path}")
@@ -222,35 +348,19 @@ def run_evaluation(
 
         gold_patches = json.loads(gold_patches_path.read_text())
         typer.echo(f"Loaded {len(gold_patches)} golden patches")
-
-        # Build patches for eval, add attempt=1
-        bad_eval_moved = _cleanup_bad_evals(base_out, instances, k, eval_id)
-        completed_evals = _get_completed_evals(base_out, instances, k, eval_id)
-
-        all_patches = []
-        for p in gold_patches:
-            iid = p["instance_id"]
-            if (iid, 1) not in completed_evals:
-                all_patches.append({
-                    "instance_id": iid,
-                    "patch": p.get("patch", ""),
-                    "prefix": eval_id,
-                    "attempt": 1,
-                })
+        gold_by_instance = {p["instance_id"]: p.get("patch", "") for p in gold_patches}
+        gold_pairs = [(iid, 1) for iid, a in pairs if a == 1 and iid in gold_by_instance]
+        state.seed(gold_pairs, claim_order(gold_pairs))
+        remaining_runs, remaining_evals = state.pending(rollouts=False)
     else:
-        # ---- Non-oracle: run agent rollouts ----
-        bad_moved = _cleanup_bad_rollouts(base_out, instances, k)
-        completed_rollouts = _get_completed_rollouts(base_out, instances, k)
-
-        work_items: list[tuple[dict, int]] = []
-        for inst in instances:
-            iid = inst["instance_id"]
-            for attempt in range(1, k + 1):
-                if (iid, attempt) not in completed_rollouts:
-                    work_items.append((inst, attempt))
-
-        total_runs = n_tasks * k
-        remaining_runs = len(work_items)
+        # Attempts leased by another worker are in progress; leave them alone
+        bad_moved = _cleanup_bad_rollouts(
+            base_out, state, {key: a for key, a in attempts.items() if not a.leased}
+        )
+        state.seed(pairs, claim_order(pairs))
+        remaining_runs, remaining_evals = state.pending()
+
+        total_runs = len(pairs)
         complete_runs = total_runs - remaining_runs
 
         if remaining_runs == 0:
@@ -261,95 +371,16 @@ def run_evaluation(
                 status += f" ({bad_moved} bad moved to __errors/)"
             typer.echo(status)
 
-            agent_config = AGENT_CONFIGS[agent]
-            provider_env = provider_env_var_from_model(model)
-            keep_n = min(k, 10)
-
-            results_by_instance: dict[str, list[AgentResult | None]] = {
-                i["instance_id"]: [None] * k for i in instances
-            }
-
-            async def run_all_agents():
-                import modal
-
-                modal.enable_output()
-                os.environ.setdefault("MODAL_MAX_THROTTLE_WAIT", str(max_wait_minutes * 60))
-
-                app = modal.App.lookup("anvil-agent-harness", create_if_missing=True)
-
-                registry_secret = None
-                if os.environ.get("REGISTRY_USERNAME") and os.environ.get("REGISTRY_PASSWORD"):
-                    registry_secret = modal.Secret.from_dict({
-                        "REGISTRY_USERNAME": os.environ["REGISTRY_USERNAME"],
-                        "REGISTRY_PASSWORD": os.environ["REGISTRY_PASSWORD"],
-                    })
-
-                semaphore = asyncio.Semaphore(max_parallel)
-                pbar = tqdm(total=remaining_runs, desc="Agent runs", unit="run", file=sys.stderr)
-
-                async def run_one(inst: dict, attempt: int) -> AgentResult:
-                    async with semaphore:
-                        result = await run_agent_in_modal(
-                            agent_config=agent_config,
-                            instance=inst,
-                            model=model,
-                            provider_env_var=provider_env,
-                            app=app,
-                            registry_secret=registry_secret,
-                        )
-
-                        iid = result.instance_id
-                        results_by_instance[iid][attempt - 1] = result
-
-                        if attempt <= keep_n:
-                            result_dir = base_out / iid / f"attempt_{attempt}" / "rollout"
-                            write_single_result(result, result_dir, eval_id)
-
-                        status = "ok" if result.exit_code == 0 and not result.error else "fail"
-                        pbar.set_postfix_str(f"{iid}:{attempt} {status}")
-                        pbar.update(1)
-
-                        return result
-
-                tasks = [
-                    asyncio.create_task(run_one(inst, attempt))
-                    for inst, attempt in work_items
-                ]
-                await asyncio.gather(*tasks)
-                pbar.close()
-
-            typer.echo(f"Running agents (max {max_parallel} parallel)...")
-            asyncio.run(run_all_agents())
-
-        # ---- Evaluation Phase for non-oracle ----
-        bad_eval_moved = _cleanup_bad_evals(base_out, instances, k, eval_id)
-        completed_evals = _get_completed_evals(base_out, instances, k, eval_id)
-
-        all_patches = []
-        for inst in instances:
-            iid = inst["instance_id"]
-            for attempt in range(1, k + 1):
-                if (iid, attempt) in completed_evals:
-                    continue
+    bad_eval_moved = _cleanup_bad_evals(
+        base_out,
+        [
+            key for key, a in attempts.items()
+            if key in in_run and (a.rollout_done or agent == "oracle")
+            and not a.eval_done and not a.leased
+        ],
+    )
 
-                pred_path = base_out / iid / f"attempt_{attempt}" / "rollout" / f"{iid}.pred"
-                patch = ""
-                if pred_path.exists():
-                    try:
-                        pred_data = json.loads(pred_path.read_text())
-                        patch = pred_data.get("model_patch", "")
-                    except (json.JSONDecodeError, OSError):
-                        pass
-
-                all_patches.append({
-                "instance_id": iid,
-                "patch": patch,
-                "prefix": eval_id,
-                "attempt": attempt,
-            })
-
-    total_evals = n_tasks * k
-    remaining_evals = len(all_patches)
+    total_evals = len(pairs)
     complete_evals = total_evals - remaining_evals
 
     if remaining_evals == 0:
@@ -360,72 +391,515 @@ def run_evaluation(
             eval_status += f" ({bad_eval_moved} bad moved to __errors/)"
         typer.echo(eval_status)
 
-    if all_patches:
-        patches_file = base_out / f"{eval_id}_all_patches.json"
-        patches_file.write_text(json.dumps(all_patches, indent=2))
-
-        eval_workers = min(len(all_patches), max_parallel)
-
-        cmd = [
-            "uv",
-            "run",
-            str(swe_bench_eval_script()),
-            f"--raw_sample_path={dataset_tasks_dir / 'tasks.csv'}",
-            f"--patch_path={patches_file}",
-            f"--output_dir={base_out}",
-            f"--scripts_dir={ensure_dir(dataset_tasks_dir / 'run_scripts')}",
-            f"--num_workers={eval_workers}",
-            f"--dockerhub_username={dockerhub_username}",
-            f"--dockerhub_repo={dockerhub_repo}",
+    if eval_parallel is None:
+        eval_parallel = max_parallel
+
+    agent_config = AGENT_CONFIGS.get(agent)
+    provider_env = provider_env_var_from_model(model) if remaining_runs or adaptive else None
+    keep_n = min(budget, 10)
+    trajectory_store = TrajectoryStore(base_out)
+
+    results_by_instance: dict[str, list[AgentResult | None]] = {
+        i["instance_id"]: [None] * budget for i in instances
+    }
+    # Pass/fail per (instance_id, attempt) evaluated by this worker
+    live_results: dict[tuple[str, int], bool] = {}
+    # Seconds each eval waited for a slot ("queue") and spent in a sandbox ("run")
+    eval_latencies: list[dict[str, float]] = []
+    # This run's view of the session's eval cache, set once the pipeline starts
+    run_cache: EvalCache | None = None
+
+    def adaptive_savings(attempts) -> dict | None:
+        """Attempts used vs fixed k so far, or None outside adaptive runs."""
+        if not adaptive:
+            return None
+        durations = [
+            attempts[key].rollout_seconds
+            for key in pairs
+            if key in attempts and attempts[key].rollout_seconds
         ]
+        return savings_summary(
+            len(pairs), n_tasks, k, budget, tolerance,
+            statistics.mean(durations) if durations else None,
+        )
 
-        # Pass environment variables (including REGISTRY_USERNAME/PASSWORD) to subprocess
-        result = subprocess.run(
-            cmd,
-            cwd=str(dataset_tasks_dir),
-            env=os.environ.copy(),
+    def save_live_summary() -> None:
+        # Read results back from the queue so other workers' evals are included
+        attempts = state.attempts()
+        by_instance: dict[str, list[bool]] = {iid: [] for iid, _ in pairs}
+        for (iid, _attempt), a in sorted(attempts.items()):
+            if (iid, _attempt) in in_run and a.eval_done:
+                by_instance[iid].append(a.eval_passed)
+        summary = compute_pass_at_k_summary(
+            by_instance, model, dataset_id, agent, k, time.time() - start_time,
+            adaptive=adaptive_savings(attempts),
         )
+        save_pass_at_k_json(summary, base_out / "eval_results_pass_at_k.json", echo=False)
+
+    def plan_next_round() -> int:
+        """Queue the next adaptive round once the current one is done. Returns attempts added."""
+        if not adaptive:
+            return 0
+        results: dict[str, dict[int, bool]] = {i["instance_id"]: {} for i in instances}
+        attempts = state.attempts()
+        for iid, attempt in _adaptive_pairs(attempts, instances, budget):
+            results[iid][attempt] = attempts[(iid, attempt)].eval_passed
+        # Planning only depends on state.db, so cooperating workers add the same round
+        new = [p for p in next_round(results, k, budget, tolerance) if p not in in_run]
+        state.seed(new, expected(), replace=False)
+        pairs.extend(new)
+        in_run.update(new)
+        return len(new)
+
+    async def run_all_agents(
+        sess: RunSession, enqueue_eval, samples, record_eval, pbar, wait_for_work
+    ):
+        from .._vendor.swe_bench_pro.swe_bench_pro_eval import grade, record_result
+
+        # Transient infra failures are retried in-run, bounded by a per-run budget
+        retry = RetryPolicy(budget=max(5, remaining_runs // 10))
+        eval_files_by_instance: dict[str, dict[str, str] | None] = {}
+        in_sandbox = {"graded": 0, "fallback": 0}
+
+        def eval_files_for(iid: str) -> dict[str, str] | None:
+            if not eval_in_sandbox or iid not in samples.index:
+                return None
+            if iid not in eval_files_by_instance:
+                eval_files_by_instance[iid] = _sandbox_eval_files(
+                    iid, samples.loc[iid], dataset_tasks_dir
+                )
+            return eval_files_by_instance[iid]
+
+        async def run_one(inst: dict, attempt: int) -> AgentResult:
+            result_dir = base_out / inst["instance_id"] / f"attempt_{attempt}" / "rollout"
+            result = await run_agent_with_retries(
+                agent_config=agent_config,
+                instance=inst,
+                model=model,
+                provider_env_var=provider_env,
+                app=sess.app,
+                registry_secret=sess.registry_secret,
+                image_cache=sess.image_cache,
+                launcher=sess.launcher,
+                snapshots=sess.snapshots,
+                log_dir=result_dir if attempt <= keep_n else None,
+                retry=retry,
+                eval_files=eval_files_for(inst["instance_id"]),
+            )
 
-        patches_file.unlink(missing_ok=True)
-        
-        if result.returncode != 0:
-            return 1
+            iid = result.instance_id
+            results_by_instance[iid][attempt - 1] = result
+            ok = result.exit_code == 0 and not result.error
+            state.record_rollout(
+                iid, attempt, ok, result.patch, result.duration_seconds, result.error_class
+            )
 
-    # ---- Aggregate Results ----
-    results_file = base_out / "eval_results.json"
-    all_results = json.loads(results_file.read_text()) if results_file.exists() else {}
-
-    eval_results: dict[str, list[bool]] = {i["instance_id"]: [] for i in instances}
-    for inst in instances:
-        iid = inst["instance_id"]
-        for attempt in range(1, k + 1):
-            key = f"{iid}:attempt_{attempt}"
-            if key in all_results:
-                eval_results[iid].append(all_results[key])
+            if attempt <= keep_n:
+                write_single_result(
+                    result, result_dir, eval_id,
+                    trajectory_store=trajectory_store, attempt=attempt,
+                )
+
+            if result.eval_output is not None:
+                # Tests already ran in the rollout sandbox; just grade them
+                try:
+                    passed = grade(result.eval_output, samples.loc[iid])
+                except Exception:
+                    passed = False
+                eval_dir = ensure_dir(base_out / iid / f"attempt_{attempt}" / "eval_results")
+                (eval_dir / f"{eval_id}_output.json").write_text(json.dumps(result.eval_output))
+                record_result(str(base_out), iid, attempt, passed)
+                record_eval(iid, attempt, passed)
+                in_sandbox["graded"] += 1
             else:
-                task_result_path = (
-                    base_out / iid / f"attempt_{attempt}" / "eval_results" / "eval_results.json"
+                # Hand the patch to the evaluator right away
+                enqueue_eval(_patch_entry(iid, result.patch, eval_id, attempt))
+                if eval_in_sandbox:
+                    in_sandbox["fallback"] += 1
+
+            pbar.set_postfix_str(f"{iid}:{attempt} {'ok' if ok else 'fail'}")
+            pbar.update(1)
+
+            return result
+
+        async def slot() -> None:
+            while True:
+                # Claim only once a slot in the (possibly shared) pool is free
+                async with sess.rollout_slots:
+                    claimed = state.claim_rollout(worker, LEASE_SECONDS)
+                    if claimed is not None:
+                        iid, attempt = claimed
+                        inst = instances_by_id[iid]
+                        snapshots = sess.snapshots
+                        if snapshots is None or not snapshots.preparing(agent_config, inst):
+                            await run_one(inst, attempt)
+                            continue
+                if claimed is None:
+                    if not await wait_for_work():
+                        return
+                    continue
+                # Another attempt is setting this instance up; wait without a slot
+                await snapshots.wait(agent_config, inst)
+                async with sess.rollout_slots:
+                    await run_one(inst, attempt)
+
+        await asyncio.gather(*(slot() for _ in range(max_parallel)))
+        typer.echo(f"{tag}Retries: {retry.used}/{retry.budget} budget used")
+        if eval_in_sandbox:
+            typer.echo(
+                f"{tag}In-sandbox evals: {in_sandbox['graded']} graded, "
+                f"{in_sandbox['fallback']} sent to a separate eval sandbox"
+            )
+
+    async def run_evals(sess: RunSession, eval_queue: asyncio.Queue, samples, record_eval):
+        from .._vendor.swe_bench_pro.swe_bench_pro_eval import evaluate_patches
+
+        async def queued_patches():
+            while (item := await eval_queue.get()) is not None:
+                yield item
+
+        async for patch_sample, passed in evaluate_patches(
+            queued_patches(),
+            samples,
+            str(base_out),
+            str(ensure_dir(dataset_tasks_dir / "run_scripts")),
+            dockerhub_username,
+            dockerhub_repo,
+            dockerfiles_dir=str(dataset_tasks_dir / "dockerfiles"),
+            session=sess.eval_session,
+            cache=run_cache,
+            semaphore=sess.eval_slots,
+        ):
+            latency = {"queue": patch_sample["eval_queue_seconds"]}
+            if "eval_seconds" in patch_sample:
+                latency["run"] = patch_sample["eval_seconds"]
+            eval_latencies.append(latency)
+            record_eval(
+                patch_sample["instance_id"], patch_sample["attempt"], passed,
+                patch_sample.get("eval_seconds"),
+            )
+
+    async def run_pipeline(sess: RunSession):
+        nonlocal run_cache
+        from .._vendor.swe_bench_pro.swe_bench_pro_eval import load_samples
+
+        # Identical patches (empty ones, gold patches on re-runs) are served from here
+        run_cache = sess.eval_cache.view() if sess.eval_cache else None
+        samples = load_samples(dataset_tasks_dir / "tasks.csv")
+        runs_pbar = None
+        if remaining_runs or adaptive:
+            runs_pbar = tqdm(
+                total=remaining_runs, desc=f"{tag}Agent runs", unit="run", file=sys.stderr,
+                position=position,
+            )
+        eval_pbar = tqdm(
+            total=remaining_evals, desc=f"{tag}Evals", unit="eval", file=sys.stderr,
+            position=position + (1 if runs_pbar is not None else 0),
+        )
+        last_saved = time.monotonic()
+        eval_queue: asyncio.Queue[dict | None] = asyncio.Queue()
+        # Attempts handed to the evaluator and not yet recorded
+        queued: set[tuple[str, int]] = set()
+        # Wakes the eval feeder when an eval finishes or the rollouts end
+        wake = sess.wake
+        # Wakes idle rollout slots when a round is added or the run is finished
+        more_work = asyncio.Event()
+        finished = False
+
+        async def wait_for_work() -> bool:
+            """Wait for more rollouts to claim; False once the run is finished."""
+            if finished:
+                return False
+            try:
+                # Leases of a worker that dies expire and become claimable
+                await asyncio.wait_for(more_work.wait(), POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            return not finished
+
+        def notify_slots() -> None:
+            more_work.set()
+            more_work.clear()
+
+        def enqueue_eval(entry: dict) -> None:
+            queued.add((entry["instance_id"], entry["attempt"]))
+            sess.evals_in_flight += 1
+            eval_queue.put_nowait(entry)
+
+        def record_eval(
+            iid: str, attempt: int, passed: bool, eval_seconds: float | None = None
+        ) -> None:
+            nonlocal last_saved
+            state.record_eval(iid, attempt, passed, eval_seconds)
+            if (iid, attempt) in queued:
+                queued.discard((iid, attempt))
+                sess.evals_in_flight -= 1
+            wake.set()
+            live_results[(iid, attempt)] = passed
+            eval_pbar.update(1)
+            eval_pbar.set_postfix_str(
+                f"{sum(live_results.values())}/{len(live_results)} passed"
+            )
+            # Rewriting the summary costs O(tasks); do it every few seconds at most
+            if time.monotonic() - last_saved > 5:
+                save_live_summary()
+                last_saved = time.monotonic()
+
+        async def feed_evals(rollouts: asyncio.Task | None, evals: asyncio.Task) -> None:
+            """Claim attempts whose rollout is done, keeping the evaluator just busy enough.
+
+            Also decides when the run is finished: nothing pending in the
+            queue (for any worker) and no further adaptive round.
+            """
+            nonlocal finished
+            while True:
+                wake.clear()
+                if evals.done() or (rollouts is not None and rollouts.done()):
+                    return  # The evaluator or the rollouts failed; the error is raised below
+                # sess.eval_slots caps running evals; claiming past it would only
+                # hold leases another worker could be evaluating
+                if sess.evals_in_flight < sess.eval_parallel:
+                    claimed = state.claim_eval(
+                        worker, LEASE_SECONDS, need_rollout=agent != "oracle"
+                    )
+                    if claimed is not None:
+                        iid, attempt = claimed
+                        patch = (
+                            gold_by_instance[iid] if agent == "oracle"
+                            else _read_pred_patch(base_out, iid, attempt)
+                        )
+                        enqueue_eval(_patch_entry(iid, patch, eval_id, attempt))
+                        continue
+                    if not any(state.pending(rollouts=agent != "oracle")):
+                        added = plan_next_round()
+                        if added:
+                            if runs_pbar is not None:
+                                runs_pbar.total += added
+                                runs_pbar.refresh()
+                            eval_pbar.total += added
+                            eval_pbar.refresh()
+                            notify_slots()
+                            continue
+                        finished = True
+                        notify_slots()
+                        return
+                try:
+                    await asyncio.wait_for(wake.wait(), POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+        async def heartbeat() -> None:
+            while True:
+                await asyncio.sleep(LEASE_SECONDS / 3)
+                state.heartbeat(worker, LEASE_SECONDS)
+
+        beats = asyncio.create_task(heartbeat())
+        evals = asyncio.create_task(run_evals(sess, eval_queue, samples, record_eval))
+        evals.add_done_callback(lambda _: wake.set())
+        rollouts = None
+        if remaining_runs or adaptive:
+            rollouts = asyncio.create_task(
+                run_all_agents(
+                    sess, enqueue_eval, samples, record_eval, runs_pbar, wait_for_work
                 )
-                if task_result_path.exists():
-                    try:
-                        task_result = json.loads(task_result_path.read_text())
-                        eval_results[iid].append(task_result.get(iid, False))
-                    except (json.JSONDecodeError, OSError):
-                        eval_results[iid].append(False)
-                else:
-                    eval_results[iid].append(False)
-
-    # Report per-attempt results
-    for attempt in range(1, k + 1):
-        passed = sum(
-            1 for r in eval_results.values() if len(r) >= attempt and r[attempt - 1]
+            )
+            rollouts.add_done_callback(lambda _: wake.set())
+        try:
+            await feed_evals(rollouts, evals)
+            if evals.done():
+                await evals
+            if rollouts is not None:
+                await rollouts
+        finally:
+            if rollouts is not None:
+                rollouts.cancel()
+            beats.cancel()
+            eval_queue.put_nowait(None)
+        await evals
+        if runs_pbar is not None:
+            runs_pbar.close()
+        eval_pbar.close()
+
+    if adaptive and not remaining_evals:
+        # Resuming between rounds: queue the next one now
+        added = plan_next_round()
+        remaining_runs += added
+        remaining_evals += added
+        if added:
+            typer.echo(f"Adaptive: queued {added} more attempts")
+
+    makespan = 0.0
+    if remaining_evals:
+        if remaining_runs:
+            typer.echo(
+                f"Running agents (max {max_parallel} parallel), "
+                f"evaluating as they finish (max {eval_parallel} parallel)..."
+            )
+        else:
+            typer.echo(f"Evaluating (max {eval_parallel} parallel)...")
+        pipeline_start = time.monotonic()
+        sess = session or await RunSession.open(
+            max_parallel, eval_parallel, max_wait_minutes,
+            snapshots=budget > 1, eval_cache=eval_cache,
+            reuse_eval_sandboxes=reuse_eval_sandboxes,
         )
-        typer.echo(f"  Attempt {attempt}: {passed}/{n_tasks} passed")
+        try:
+            await run_pipeline(sess)
+            if session is None:
+                # A shared session reports once, after all of its runs
+                sess.echo_stats()
+        finally:
+            state.release(worker)
+            if session is None:
+                await sess.close()
+        makespan = time.monotonic() - pipeline_start
+
+    phases = [r.phases for rs in results_by_instance.values() for r in rs if r]
+    if phases:
+        phase_summary = summarize_phases(phases)
+        (base_out / "phase_timings.json").write_text(json.dumps(phase_summary, indent=2))
+        typer.echo("Rollout phases (p50 / p95):")
+        for name, st in phase_summary.items():
+            typer.echo(f"  {name:<22} {st['p50']:8.1f}s {st['p95']:8.1f}s")
+
+    if eval_latencies:
+        latency_summary = summarize_phases(eval_latencies)
+        (base_out / "eval_latency.json").write_text(json.dumps(latency_summary, indent=2))
+        typer.echo("Eval latency (p50 / p95):")
+        for name, st in latency_summary.items():
+            typer.echo(f"  {name:<22} {st['p50']:8.1f}s {st['p95']:8.1f}s")
 
+    # ---- Aggregate Results ----
+    attempts = state.attempts()
+    state.close()
+    if adaptive:
+        # Cooperating workers may have added rounds this one didn't plan itself
+        pairs = _adaptive_pairs(attempts, instances, budget)
+        in_run = set(pairs)
+
+    # Predicted vs actual durations of the rollouts run by this worker
+    scheduled = [
+        (iid, attempt, a.expected_seconds, (a.rollout_seconds or 0) + (a.eval_seconds or 0))
+        for iid, rs in results_by_instance.items()
+        for attempt, result in enumerate(rs, 1)
+        if result and (a := attempts.get((iid, attempt))) and a.expected_seconds is not None
+    ]
+    if scheduled:
+        schedule = summarize_schedule(
+            [(p, actual) for _, _, p, actual in scheduled], makespan, max_parallel
+        )
+        schedule["per_attempt"] = [
+            {"instance_id": iid, "attempt": attempt, "predicted": p, "actual": actual}
+            for iid, attempt, p, actual in scheduled
+        ]
+        (base_out / "schedule.json").write_text(json.dumps(schedule, indent=2))
+        typer.echo(
+            f"Schedule: makespan {schedule['makespan_seconds']:.0f}s, lower bound "
+            f"{schedule['lower_bound_seconds']:.0f}s ({schedule['efficiency']:.0%}); "
+            f"predicted durations off by {schedule['mean_abs_error_seconds']:.0f}s on average"
+        )
+
+    if remaining_evals:
+        merged = {
+            f"{iid}:attempt_{attempt}": a.eval_passed
+            for (iid, attempt), a in sorted(attempts.items())
+            if (iid, attempt) in in_run and a.eval_done
+        }
+        (base_out / "eval_results.json").write_text(json.dumps(merged, indent=2))
+
+    eval_results: dict[str, list[bool]] = {}
+    attempts_by_instance: dict[str, list[int]] = {}
+    for iid, attempt in pairs:
+        a = attempts.get((iid, attempt))
+        eval_results.setdefault(iid, []).append(bool(a and a.eval_passed))
+        attempts_by_instance.setdefault(iid, []).append(attempt)
+
+    if shard_spec:
+        passed = sum(sum(r) for r in eval_results.values())
+        typer.echo(f"  Shard {shard_spec}: {passed}/{len(pairs)} attempts passed")
+    else:
+        # Report per-attempt results
+        for attempt in range(1, budget + 1):
+            ran = sum(1 for r in eval_results.values() if len(r) >= attempt)
+            passed = sum(
+                1 for r in eval_results.values() if len(r) >= attempt and r[attempt - 1]
+            )
+            if ran:
+                typer.echo(f"  Attempt {attempt}: {passed}/{ran} passed")
+
+    metrics = extract_run_metrics(
+        base_out,
+        attempts_by_instance,
+        {iid for iid, r in eval_results.items() if any(r)},
+    )
     summary = compute_pass_at_k_summary(
-        eval_results, model, dataset_id, agent, k, time.time() - start_time
+        eval_results, model, dataset_id, agent, k, time.time() - start_time, metrics,
+        eval_cache=run_cache.stats() if run_cache else None,
+        adaptive=adaptive_savings(attempts),
     )
     print_pass_at_k_summary(summary)
     save_pass_at_k_json(summary, base_out / "eval_results_pass_at_k.json")
     
     return 0 if any(r.solved for r in summary.per_instance) else 1
+
+
+def load_matrix(path: Path) -> list[dict]:
+    """Read a matrix file: a YAML list of models, or of mappings with ``model``
+    and optional ``agent``/``n_attempts`` overrides."""
+    entries = YAML(typ="safe").load(path.read_text()) or []
+    runs = []
+    for entry in entries:
+        run = {"model": entry} if isinstance(entry, str) else dict(entry)
+        unknown = set(run) - {"model", "agent", "n_attempts"}
+        if "model" not in run or unknown:
+            raise ValueError(f"Invalid matrix entry {entry!r} in {path}")
+        runs.append(run)
+    return runs
+
+
+def run_matrix(runs: list[dict], **common) -> int:
+    """Run several models on a dataset in one session.
+
+    Each entry of ``runs`` overrides keyword arguments of ``run_evaluation``
+    given in ``common`` (at least ``model``). Runs share the Modal app and
+    registry secret, agent images, setup snapshots, the eval cache and one
+    pool of ``max_parallel`` rollout slots. Each still writes its own run
+    directory and pass@k summary. Returns the worst exit code.
+    """
+    runs = [{**common, **run} for run in runs]
+    eval_ids = [_eval_id(r.get("agent", "mini-swe-agent"), r["model"]) for r in runs]
+    if len(set(eval_ids)) != len(eval_ids):
+        typer.echo("Error: the same model and agent appear more than once")
+        return 1
+    if any(r.get("agent") == "oracle" for r in runs):
+        typer.echo("Error: the oracle agent can't be part of a model matrix")
+        return 1
+    if common.get("output"):
+        # One run directory per model under the given output directory
+        for run, eval_id in zip(runs, eval_ids):
+            run["output"] = str(Path(common["output"]) / eval_id)
+
+    max_parallel = common.get("max_parallel", 30)
+    max_k = max(r.get("n_attempts", 1) for r in runs)
+
+    async def main() -> int:
+        session = await RunSession.open(
+            max_parallel,
+            common.get("eval_parallel") or max_parallel,
+            common.get("max_wait_minutes") or max(10, 10 * max_k // 2),
+            # Attempts of every model start from the same per-instance setup
+            snapshots=True,
+            eval_cache=common.get("eval_cache", True),
+            reuse_eval_sandboxes=common.get("reuse_eval_sandboxes", False),
+        )
+        try:
+            rcs = await asyncio.gather(*(
+                run_evaluation_async(**run, session=session, position=2 * i)
+                for i, run in enumerate(runs)
+            ))
+        finally:
+            await session.close()
+        session.echo_stats()
+        return max(rcs)
+
+    return asyncio.run(main())
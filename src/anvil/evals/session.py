@@ -0,0 +1,129 @@
+"""Orchestration state shared by every run in one process.
+
+A single ``run-evals`` invocation has one run. With several models
+(``--model a --model b`` or ``--matrix``) all runs share one
+``RunSession``. The session holds one Modal app lookup and one registry
+secret. It also holds the agent image cache, the eval image cache, the
+sandbox launcher, setup snapshots, the eval cache, and single pools of
+rollout and eval slots. The models therefore compete for one
+``--max-parallel`` and one ``--eval-parallel`` budget instead of each
+taking their own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+import typer
+
+from ..agents.image_cache import AgentImageCache
+from ..agents.launcher import LaunchLimiter
+from ..agents.snapshots import SnapshotCache
+from ..config import cache_dir
+from .cache import EvalCache
+
+if TYPE_CHECKING:
+    import modal
+
+    from .._vendor.swe_bench_pro.swe_bench_pro_eval import EvalSession
+
+
+@dataclass
+class RunSession:
+    app: modal.App
+    registry_secret: modal.Secret | None
+    image_cache: AgentImageCache
+    eval_session: EvalSession
+    launcher: LaunchLimiter
+    snapshots: SnapshotCache | None
+    eval_cache: EvalCache | None
+    rollout_slots: asyncio.Semaphore
+    # Held by every eval sandbox, whichever run's evaluator started it
+    eval_slots: asyncio.Semaphore
+    eval_parallel: int
+    # Patches handed to an evaluator and not yet recorded, across all runs
+    evals_in_flight: int = 0
+    # Set whenever an eval finishes or a run's rollouts end, to wake eval feeders
+    wake: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @classmethod
+    async def open(
+        cls,
+        max_parallel: int,
+        eval_parallel: int,
+        max_wait_minutes: int,
+        snapshots: bool = False,
+        eval_cache: bool = True,
+        reuse_eval_sandboxes: bool = False,
+    ) -> RunSession:
+        import modal
+
+        from .._vendor.swe_bench_pro.swe_bench_pro_eval import EvalSession
+
+        modal.enable_output()
+        os.environ.setdefault("MODAL_MAX_THROTTLE_WAIT", str(max_wait_minutes * 60))
+
+        # One app and one registry secret shared by rollout and eval sandboxes
+        app = await modal.App.lookup.aio("anvil-agent-harness", create_if_missing=True)
+
+        registry_secret = None
+        if os.environ.get("REGISTRY_USERNAME") and os.environ.get("REGISTRY_PASSWORD"):
+            registry_secret = modal.Secret.from_dict({
+                "REGISTRY_USERNAME": os.environ["REGISTRY_USERNAME"],
+                "REGISTRY_PASSWORD": os.environ["REGISTRY_PASSWORD"],
+            })
+
+        # Eval images are built once per registry digest, across runs too
+        eval_session = EvalSession(
+            app, registry_secret, index_path=str(cache_dir() / "eval_images.json"),
+            reuse_sandboxes=reuse_eval_sandboxes,
+        )
+        # Agent images are keyed on the same digests, resolved once for both
+        image_cache = AgentImageCache(resolve_digest=eval_session.digest)
+        launcher = LaunchLimiter()
+        return cls(
+            app=app,
+            registry_secret=registry_secret,
+            image_cache=image_cache,
+            eval_session=eval_session,
+            launcher=launcher,
+            # Set each instance up once and fork, when attempts or models share it
+            snapshots=(
+                SnapshotCache(app, registry_secret, image_cache, launcher) if snapshots else None
+            ),
+            eval_cache=EvalCache() if eval_cache else None,
+            rollout_slots=asyncio.Semaphore(max_parallel),
+            eval_slots=asyncio.Semaphore(eval_parallel),
+            eval_parallel=eval_parallel,
+        )
+
+    def echo_stats(self) -> None:
+        typer.echo(
+            f"Agent images: {self.image_cache.builds} built, {self.image_cache.hits} reused"
+        )
+        ev = self.eval_session
+        if ev.builds or ev.hits:
+            line = f"Eval images: {ev.builds} built, {ev.hits} reused"
+            if ev.unpinned:
+                line += f" ({ev.unpinned} without a registry digest, rebuilt from the tag)"
+            typer.echo(line)
+        if ev.reuse_sandboxes:
+            typer.echo(
+                f"Warm eval sandboxes: {ev.warm_reused} reuses, "
+                f"{ev.warm_discarded} discarded (unclean tree or broken sandbox)"
+            )
+        typer.echo(f"Sandbox launches: {self.launcher.summary()}")
+        if self.snapshots is not None:
+            typer.echo(
+                f"Setup snapshots: {self.snapshots.prepared} prepared, "
+                f"{self.snapshots.reused} reused, "
+                f"{self.snapshots.failed} fell back to full setup"
+            )
+
+    async def close(self) -> None:
+        await self.eval_session.close()
+        if self.eval_cache is not None:
+            self.eval_cache.close()
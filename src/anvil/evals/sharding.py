@@ -0,0 +1,97 @@
+"""Static sharding of a run's (instance, attempt) pairs across machines.
+
+``plan_shards`` splits the pairs into N shards with longest-processing-time
+first assignment on expected durations, so shards finish at about the same
+time. The plan is deterministic for the same pairs and durations. Durations
+come from local run history, which differs between machines, so every shard
+writes the full plan to ``shard_manifest.json``. Pass that file to the other
+shards with ``--shard-manifest`` to make sure all machines use the same
+plan. ``anvil merge-runs`` checks that the shards line up.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import json
+import statistics
+from dataclasses import dataclass
+from pathlib import Path
+
+MANIFEST_FILE = "shard_manifest.json"
+
+Pair = tuple[str, int]
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Shard ``index`` (1-based) of ``count``."""
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, spec: str) -> ShardSpec:
+        try:
+            index, count = (int(x) for x in spec.split("/"))
+        except ValueError:
+            raise ValueError(f"Invalid shard '{spec}', expected i/N (e.g. 1/4)") from None
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"Invalid shard '{spec}', need 1 <= i <= N")
+        return cls(index, count)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    @property
+    def dirname(self) -> str:
+        return f"shard_{self.index}_of_{self.count}"
+
+
+def plan_shards(
+    pairs: list[Pair], count: int, durations: dict[str, float]
+) -> list[list[Pair]]:
+    """Assign pairs to ``count`` shards, longest expected first, to the least loaded shard.
+
+    Instances without history are assumed to take the median known duration.
+    """
+    default = statistics.median(durations.values()) if durations else 1.0
+    order = sorted(pairs, key=lambda p: (-durations.get(p[0], default), p[0], p[1]))
+
+    shards: list[list[Pair]] = [[] for _ in range(count)]
+    loads = [(0.0, i) for i in range(count)]
+    for pair in order:
+        load, i = heapq.heappop(loads)
+        shards[i].append(pair)
+        heapq.heappush(loads, (load + durations.get(pair[0], default), i))
+    return [sorted(shard) for shard in shards]
+
+
+def plan_digest(shards: list[list[Pair]]) -> str:
+    return hashlib.sha256(json.dumps(shards).encode()).hexdigest()[:16]
+
+
+def write_manifest(
+    run_dir: Path,
+    spec: ShardSpec,
+    shards: list[list[Pair]],
+    **run_info,
+) -> None:
+    """Record the shard's identity, the run it belongs to and the full plan."""
+    manifest = {
+        **run_info,
+        "index": spec.index,
+        "count": spec.count,
+        "plan_digest": plan_digest(shards),
+        "plan": shards,
+    }
+    (run_dir / MANIFEST_FILE).write_text(json.dumps(manifest))
+
+
+def read_manifest(path: Path) -> dict:
+    """Load a manifest (or the manifest inside a shard directory)."""
+    if path.is_dir():
+        path = path / MANIFEST_FILE
+    manifest = json.loads(path.read_text())
+    manifest["plan"] = [[(iid, attempt) for iid, attempt in shard] for shard in manifest["plan"]]
+    return manifest
@@ -0,0 +1,407 @@
+"""Per-run state database and work queue.
+
+Every (instance_id, attempt) of a run has one row in ``state.db`` recording
+its rollout status, eval result, patch hash and timings. Resume reads the
+whole run with one query instead of stat-ing and parsing a metadata file per
+attempt. The per-attempt file tree (metadata.json, .pred, eval_results.json)
+is still written as an export, and a run directory created before the
+database existed is imported from it once.
+
+The same table is the run's work queue. A worker claims an unfinished
+attempt by taking a lease on it. It keeps the lease alive with heartbeats
+until the attempt's eval is recorded. Several ``anvil run-evals`` processes
+pointed at the same output directory split the work this way. If a worker
+stops heartbeating, its leases expire and other workers reclaim them.
+
+Every access takes an ``flock`` on ``state.lock`` and the database uses a
+rollback journal rather than WAL. WAL needs shared memory, so it does not
+work when the run directory is on a shared network filesystem.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+STATE_FILE = "state.db"
+LOCK_FILE = "state.lock"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    instance_id TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    rollout_status TEXT,
+    error_class TEXT,
+    patch_sha TEXT,
+    rollout_seconds REAL,
+    rollout_finished_at REAL,
+    eval_passed INTEGER,
+    eval_finished_at REAL,
+    eval_seconds REAL,
+    expected_seconds REAL,
+    in_run INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    PRIMARY KEY (instance_id, attempt)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first version of the schema
+_ADDED_COLUMNS = {
+    "in_run": "INTEGER NOT NULL DEFAULT 0",
+    "worker": "TEXT",
+    "lease_expires": "REAL",
+    "eval_seconds": "REAL",
+    "expected_seconds": "REAL",
+}
+
+ROLLOUT_OK = "ok"
+ROLLOUT_FAILED = "failed"
+
+
+@dataclass
+class AttemptState:
+    instance_id: str
+    attempt: int
+    rollout_status: str | None
+    error_class: str | None
+    patch_sha: str | None
+    rollout_seconds: float | None
+    eval_passed: bool | None
+    leased: bool = False
+    eval_seconds: float | None = None
+    expected_seconds: float | None = None  # predicted rollout + eval time when queued
+
+    @property
+    def rollout_done(self) -> bool:
+        return self.rollout_status == ROLLOUT_OK
+
+    @property
+    def eval_done(self) -> bool:
+        return self.eval_passed is not None
+
+
+def patch_sha(patch: str) -> str:
+    return hashlib.sha256(patch.encode()).hexdigest()
+
+
+def worker_id() -> str:
+    """Identify this process as ``host:pid``."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RunState:
+    """SQLite-backed record and work queue of a run's attempts."""
+
+    def __init__(self, run_dir: Path):
+        self.path = run_dir / STATE_FILE
+        self.lock_path = run_dir / LOCK_FILE
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        with self._locked():
+            self.conn.execute("PRAGMA journal_mode=DELETE")
+            self.conn.executescript(_SCHEMA)
+            columns = {r[1] for r in self.conn.execute("PRAGMA table_info(attempts)")}
+            for name, decl in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE attempts ADD COLUMN {name} {decl}")
+            self.conn.commit()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self.lock_path.open("a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _get_meta(self, key: str) -> str | None:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def attempts(self) -> dict[tuple[str, int], AttemptState]:
+        """Every recorded attempt, keyed by (instance_id, attempt)."""
+        with self._locked():
+            rows = self.conn.execute(
+                "SELECT instance_id, attempt, rollout_status, error_class, patch_sha, "
+                "rollout_seconds, eval_passed, lease_expires > ?, eval_seconds, "
+                "expected_seconds FROM attempts",
+                (time.time(),),
+            ).fetchall()
+        return {
+            (r[0], r[1]): AttemptState(
+                instance_id=r[0],
+                attempt=r[1],
+                rollout_status=r[2],
+                error_class=r[3],
+                patch_sha=r[4],
+                rollout_seconds=r[5],
+                eval_passed=None if r[6] is None else bool(r[6]),
+                leased=bool(r[7]),
+                eval_seconds=r[8],
+                expected_seconds=r[9],
+            )
+            for r in rows
+        }
+
+    def record_rollout(
+        self,
+        instance_id: str,
+        attempt: int,
+        ok: bool,
+        patch: str,
+        duration_seconds: float | None = None,
+        error_class: str | None = None,
+    ) -> None:
+        """Record a finished rollout. Clears any eval result from an earlier rollout."""
+        with self._locked(), self.conn:
+            self.conn.execute(
+                "INSERT INTO attempts (instance_id, attempt, rollout_status, error_class, "
+                "patch_sha, rollout_seconds, rollout_finished_at, eval_passed, eval_finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL) "
+                "ON CONFLICT (instance_id, attempt) DO UPDATE SET "
+                "rollout_status = excluded.rollout_status, "
+                "error_class = excluded.error_class, "
+                "patch_sha = excluded.patch_sha, "
+                "rollout_seconds = excluded.rollout_seconds, "
+                "rollout_finished_at = excluded.rollout_finished_at, "
+                "eval_passed = NULL, eval_finished_at = NULL",
+                (
+                    instance_id,
+                    attempt,
+                    ROLLOUT_OK if ok else ROLLOUT_FAILED,
+                    error_class,
+                    patch_sha(patch),
+                    duration_seconds,
+                    time.time(),
+                ),
+            )
+
+    def record_eval(
+        self,
+        instance_id: str,
+        attempt: int,
+        passed: bool,
+        duration_seconds: float | None = None,
+    ) -> None:
+        """Record an eval result. This finishes the attempt and releases its lease."""
+        with self._locked(), self.conn:
+            self.conn.execute(
+                "INSERT INTO attempts (instance_id, attempt, eval_passed, eval_finished_at, "
+                "eval_seconds) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (instance_id, attempt) DO UPDATE SET "
+                "eval_passed = excluded.eval_passed, "
+                "eval_finished_at = excluded.eval_finished_at, "
+                "eval_seconds = excluded.eval_seconds, "
+                "worker = NULL, lease_expires = NULL",
+                (instance_id, attempt, int(passed), time.time(), duration_seconds),
+            )
+
+    def forget(self, instance_id: str, attempt: int) -> None:
+        """Drop an attempt so it is run again from scratch."""
+        with self._locked(), self.conn:
+            self.conn.execute(
+                "DELETE FROM attempts WHERE instance_id = ? AND attempt = ?",
+                (instance_id, attempt),
+            )
+
+    # ---- Work queue ----
+
+    def seed(
+        self,
+        pairs: list[tuple[str, int]],
+        expected_seconds: dict[str, float] | None = None,
+        replace: bool = True,
+    ) -> None:
+        """Mark these attempts as the run's work, adding rows as needed.
+
+        ``expected_seconds`` (per instance) sets the claim order: longest first;
+        attempts it leaves out keep the expectation they were queued with.
+        With ``replace=False`` the attempts are added to those already in the run.
+        """
+        expected_seconds = expected_seconds or {}
+        with self._locked(), self.conn:
+            if replace:
+                self.conn.execute("UPDATE attempts SET in_run = 0")
+            self.conn.executemany(
+                "INSERT INTO attempts (instance_id, attempt, in_run, expected_seconds) "
+                "VALUES (?, ?, 1, ?) "
+                "ON CONFLICT (instance_id, attempt) DO UPDATE SET in_run = 1, "
+                "expected_seconds = COALESCE(excluded.expected_seconds, expected_seconds)",
+                [(iid, attempt, expected_seconds.get(iid)) for iid, attempt in pairs],
+            )
+
+    def claim_rollout(self, worker: str, lease_seconds: float) -> tuple[str, int] | None:
+        """Lease the next attempt whose rollout has not succeeded yet, longest expected first."""
+        return self._claim(worker, lease_seconds, "rollout_status IS NOT ?", (ROLLOUT_OK,))
+
+    def claim_eval(
+        self, worker: str, lease_seconds: float, need_rollout: bool = True
+    ) -> tuple[str, int] | None:
+        """Lease the next attempt with a finished rollout and no eval result.
+
+        With ``need_rollout=False`` (the oracle, which has no rollouts) any
+        unevaluated attempt qualifies.
+        """
+        if need_rollout:
+            return self._claim(worker, lease_seconds, "rollout_status = ?", (ROLLOUT_OK,))
+        return self._claim(worker, lease_seconds, "1", ())
+
+    def _claim(
+        self, worker: str, lease_seconds: float, condition: str, params: tuple
+    ) -> tuple[str, int] | None:
+        now = time.time()
+        with self._locked(), self.conn:
+            row = self.conn.execute(
+                "SELECT instance_id, attempt FROM attempts "
+                "WHERE in_run = 1 AND eval_passed IS NULL "
+                f"AND (lease_expires IS NULL OR lease_expires < ?) AND {condition} "
+                "ORDER BY expected_seconds IS NULL, expected_seconds DESC, rowid LIMIT 1",
+                (now, *params),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE attempts SET worker = ?, lease_expires = ? "
+                "WHERE instance_id = ? AND attempt = ?",
+                (worker, now + lease_seconds, row[0], row[1]),
+            )
+        return row[0], row[1]
+
+    def heartbeat(self, worker: str, lease_seconds: float) -> None:
+        """Extend every lease held by ``worker``."""
+        with self._locked(), self.conn:
+            self.conn.execute(
+                "UPDATE attempts SET lease_expires = ? WHERE worker = ? AND lease_expires IS NOT NULL",
+                (time.time() + lease_seconds, worker),
+            )
+
+    def release(self, worker: str) -> None:
+        """Give up every lease held by ``worker`` (e.g. on shutdown)."""
+        with self._locked(), self.conn:
+            self.conn.execute(
+                "UPDATE attempts SET worker = NULL, lease_expires = NULL WHERE worker = ?",
+                (worker,),
+            )
+
+    def release_dead_workers(self) -> int:
+        """Release leases of workers on this host whose process has exited."""
+        host = socket.gethostname()
+        with self._locked(), self.conn:
+            workers = [
+                r[0]
+                for r in self.conn.execute(
+                    "SELECT DISTINCT worker FROM attempts WHERE worker LIKE ?", (f"{host}:%",)
+                )
+            ]
+            dead = [w for w in workers if not _pid_alive(int(w.rsplit(":", 1)[1]))]
+            for w in dead:
+                self.conn.execute(
+                    "UPDATE attempts SET worker = NULL, lease_expires = NULL WHERE worker = ?",
+                    (w,),
+                )
+        return len(dead)
+
+    def pending(self, rollouts: bool = True) -> tuple[int, int]:
+        """(rollouts left, evals left) among the run's attempts."""
+        with self._locked():
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(rollout_status IS NOT ? AND eval_passed IS NULL), 0), "
+                "COALESCE(SUM(eval_passed IS NULL), 0) FROM attempts WHERE in_run = 1",
+                (ROLLOUT_OK,),
+            ).fetchone()
+        return (row[0] if rollouts else 0), row[1]
+
+    def import_tree(self, instances: list[dict], k: int) -> int:
+        """Import attempts from a run directory written before state.db existed.
+
+        Runs once per run directory; later calls return 0 without touching the
+        file tree. Returns the number of attempts imported.
+        """
+        with self._locked():
+            if self._get_meta("imported_at") is not None:
+                return 0
+
+            run_dir = self.path.parent
+            rows = []
+            for inst in instances:
+                iid = inst["instance_id"]
+                for attempt in range(1, k + 1):
+                    attempt_dir = run_dir / iid / f"attempt_{attempt}"
+                    if not attempt_dir.exists():
+                        continue
+                    row = _read_attempt_dir(attempt_dir, iid, attempt)
+                    if row is not None:
+                        rows.append(row)
+
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO attempts (instance_id, attempt, rollout_status, "
+                    "error_class, patch_sha, rollout_seconds, rollout_finished_at, "
+                    "eval_passed, eval_finished_at) VALUES (?, ?, ?, ?, ?, ?, NULL, ?, NULL)",
+                    rows,
+                )
+                self._set_meta("imported_at", str(time.time()))
+        return len(rows)
+
+
+def _read_attempt_dir(attempt_dir: Path, iid: str, attempt: int) -> tuple | None:
+    rollout = attempt_dir / "rollout"
+    status = error_class = sha = seconds = None
+    try:
+        meta = json.loads((rollout / "metadata.json").read_text())
+        ok = meta.get("exit_code") == 0 and meta.get("error") is None
+        status = ROLLOUT_OK if ok else ROLLOUT_FAILED
+        error_class = meta.get("error_class")
+        seconds = meta.get("duration_seconds")
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        pass
+    try:
+        pred = json.loads((rollout / f"{iid}.pred").read_text())
+        sha = patch_sha(pred.get("model_patch", ""))
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        pass
+
+    passed = None
+    try:
+        results = json.loads((attempt_dir / "eval_results" / "eval_results.json").read_text())
+        passed = int(bool(results.get(iid, False)))
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        pass
+
+    if status is None and passed is None:
+        return None
+    return (iid, attempt, status, error_class, sha, seconds, passed)
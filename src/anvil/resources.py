@@ -0,0 +1,129 @@
+"""Recommend per-instance sandbox resources from past runs."""
+
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import typer
+from ruamel.yaml import YAML
+
+from .config import runs_dir, tasks_dir
+
+MIN_TIMEOUT = 300
+MIN_MEMORY_MB = 1024
+MIN_CPU = 0.5
+
+
+@dataclass
+class UsageHistory:
+    """Observed rollout usage for one instance across past runs."""
+
+    durations: list[float] = field(default_factory=list)
+    peak_memory_mb: list[float] = field(default_factory=list)
+    avg_cores: list[float] = field(default_factory=list)
+    timed_out: int = 0
+
+
+def collect_usage(dataset_id: str) -> dict[str, UsageHistory]:
+    """Gather durations and peak usage from every run's rollout metadata."""
+    history: dict[str, UsageHistory] = {}
+    root = runs_dir(dataset_id)
+    if not root.exists():
+        return history
+
+    # Recursive so sharded runs (<eval_id>/shard_<i>_of_<n>/...) are included
+    for meta_path in root.glob("**/attempt_*/rollout/metadata.json"):
+        if "__errors" in meta_path.parts:
+            continue
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (json.JSONDecodeError, OSError):
+            continue
+        iid = meta.get("instance_id") or meta_path.parents[2].name
+        usage = history.setdefault(iid, UsageHistory())
+        # The sandbox timeout bounds the script, not the host-side image build or
+        # snapshot wait around it; older metadata without phases only has the total
+        duration = (meta.get("phases") or {}).get("script") or meta.get("duration_seconds")
+        if duration:
+            usage.durations.append(duration)
+            timeout = (meta.get("resources") or {}).get("timeout")
+            if timeout and duration >= 0.95 * timeout:
+                usage.timed_out += 1
+        if meta.get("peak_memory_mb"):
+            usage.peak_memory_mb.append(meta["peak_memory_mb"])
+        if meta.get("cpu_seconds") and duration:
+            usage.avg_cores.append(meta["cpu_seconds"] / duration)
+    return history
+
+
+def recommend(usage: UsageHistory) -> dict:
+    """Derive cpu/memory/timeout with headroom over the worst observed attempt."""
+    rec: dict = {}
+    if usage.durations:
+        worst = max(usage.durations)
+        # Attempts that hit their timeout tell us only a lower bound; double it
+        factor = 2.0 if usage.timed_out else 1.5
+        rec["timeout"] = max(MIN_TIMEOUT, int(math.ceil(worst * factor / 60) * 60))
+    if usage.peak_memory_mb:
+        mem = max(usage.peak_memory_mb) * 1.5
+        rec["memory"] = max(MIN_MEMORY_MB, int(math.ceil(mem / 512) * 512))
+    if usage.avg_cores:
+        cores = max(usage.avg_cores) * 1.5
+        rec["cpu"] = max(MIN_CPU, math.ceil(cores * 2) / 2)
+    return rec
+
+
+def _update_instances_yaml(inst_path: Path, recs: dict[str, dict]) -> int:
+    """Write recommendations into instances.yaml. Returns count updated."""
+    yaml = YAML()
+    yaml.preserve_quotes = True
+
+    with inst_path.open() as f:
+        instances = yaml.load(f)
+
+    updated = 0
+    for inst in instances:
+        rec = recs.get(inst.get("instance_id", ""))
+        if rec:
+            inst.update(rec)
+            updated += 1
+
+    with inst_path.open("w") as f:
+        yaml.dump(instances, f)
+
+    return updated
+
+
+def recommend_resources(
+    dataset_id: str = typer.Option(..., "--dataset", help="Dataset ID or path"),
+    write: bool = typer.Option(
+        False, "--write", help="Write recommendations into instances.yaml"
+    ),
+) -> None:
+    """Recommend per-instance cpu/memory/timeout from past runs."""
+    history = collect_usage(dataset_id)
+    if not history:
+        typer.echo(f"No rollout metadata found under {runs_dir(dataset_id)}", err=True)
+        raise typer.Exit(1)
+
+    recs = {iid: recommend(usage) for iid, usage in sorted(history.items())}
+
+    typer.echo(f"  {'Task':<40} {'runs':>5} {'cpu':>5} {'memory':>8} {'timeout':>8}")
+    typer.echo("  " + "─" * 70)
+    for iid, rec in recs.items():
+        name = (iid[:38] + "..") if len(iid) > 40 else iid
+        typer.echo(
+            f"  {name:<40} {len(history[iid].durations):>5} "
+            f"{rec.get('cpu', '-'):>5} {rec.get('memory', '-'):>8} {rec.get('timeout', '-'):>8}"
+        )
+
+    if write:
+        inst_path = tasks_dir(dataset_id) / "instances.yaml"
+        if not inst_path.exists():
+            typer.echo(f"{inst_path} not found", err=True)
+            raise typer.Exit(1)
+        updated = _update_instances_yaml(inst_path, recs)
+        typer.echo(f"Updated {updated} instance(s) in instances.yaml")
@@ -8,8 +8,13 @@ import typer
 
 
 def run_evals(
-    model: str | None = typer.Option(
-        None, "--model", help="Model ID (required for agents, optional for oracle)"
+    model: list[str] | None = typer.Option(
+        None,
+        "--model",
+        help="Model ID (required for agents, optional for oracle); repeat to compare models",
+    ),
+    matrix: str | None = typer.Option(
+        None, "--matrix", help="YAML file listing the models (and agents) to compare"
     ),
     dataset: str = typer.Option(..., "--dataset", help="Dataset ID or path"),
     agent: Annotated[
@@ -36,6 +41,69 @@ def run_evals(
             help="Max concurrent runs",
         ),
     ] = 30,
+    eval_parallel: Annotated[
+        int | None,
+        typer.Option(
+            "--eval-parallel",
+            help="Max concurrent evals (defaults to --max-parallel)",
+        ),
+    ] = None,
+    eval_in_sandbox: Annotated[
+        bool,
+        typer.Option(
+            "--eval-in-sandbox",
+            help="Run the tests in each rollout's own sandbox instead of a fresh one",
+        ),
+    ] = False,
+    reuse_eval_sandboxes: Annotated[
+        bool,
+        typer.Option(
+            "--reuse-eval-sandboxes",
+            help="Evaluate later attempts of a task in its earlier eval sandbox, reset and checked clean",
+        ),
+    ] = False,
+    no_eval_cache: Annotated[
+        bool,
+        typer.Option(
+            "--no-eval-cache",
+            help="Evaluate every patch even if an identical one was evaluated before",
+        ),
+    ] = False,
+    shard: Annotated[
+        str | None,
+        typer.Option(
+            "--shard",
+            help="Run only shard i of N (e.g. 1/4), balanced by past durations",
+        ),
+    ] = None,
+    shard_manifest: Annotated[
+        str | None,
+        typer.Option(
+            "--shard-manifest",
+            help="Shard plan to use (shard_manifest.json from another shard)",
+        ),
+    ] = None,
+    adaptive: Annotated[
+        bool,
+        typer.Option(
+            "--adaptive",
+            help="Run attempts in rounds and stop sampling a task once its pass@k is settled",
+        ),
+    ] = False,
+    tolerance: Annotated[
+        float,
+        typer.Option(
+            "--tolerance",
+            help="With --adaptive, stop once more attempts can move a task's pass@k by at most this",
+        ),
+    ] = 0.0,
+    max_attempts: Annotated[
+        int | None,
+        typer.Option(
+            "--max-attempts",
+            help="With --adaptive, most attempts per task (defaults to --n-attempts)",
+        ),
+    ] = None,
     no_continue: Annotated[
         bool,
         typer.Option(
@@ -54,10 +122,11 @@ def run_evals(
     ),
 ) -> None:
     """Run evaluation with an agent on a dataset."""
-    from .evals import run_evaluation
+    from pathlib import Path
 
-    rc = run_evaluation(
-        model=model,
+    from .evals import load_matrix, run_evaluation, run_matrix
+
+    options = dict(
         dataset_id=dataset,
         dockerhub_username=dockerhub_username,
         dockerhub_repo=dockerhub_repo,
@@ -67,5 +136,28 @@ def run_evals(
         max_wait_minutes=max_wait,
         max_parallel=max_parallel,
         no_continue=no_continue,
+        eval_parallel=eval_parallel,
+        eval_in_sandbox=eval_in_sandbox,
+        eval_cache=not no_eval_cache,
+        reuse_eval_sandboxes=reuse_eval_sandboxes,
+        shard=shard,
+        shard_manifest=shard_manifest,
+        adaptive=adaptive,
+        tolerance=tolerance,
+        max_attempts=max_attempts,
     )
+    models = model or []
+    if matrix and models:
+        typer.echo("Error: pass either --model or --matrix, not both")
+        raise typer.Exit(1)
+
+    if matrix or len(models) > 1:
+        try:
+            runs = load_matrix(Path(matrix)) if matrix else [{"model": m} for m in models]
+        except (OSError, ValueError) as e:
+            typer.echo(f"Error: {e}")
+            raise typer.Exit(1)
+        rc = run_matrix(runs, **options)
+    else:
+        rc = run_evaluation(model=models[0] if models else None, **options)
     raise typer.Exit(rc)